@@ -1,16 +1,25 @@
-from ultralytics import YOLO
 import cv2
 import numpy as np
 from collections import deque
 import json
+import math
+import operator
 import os
+import time
+from distance_kalman import DistanceKalman
+from keyframe_tracker import KeyframeTracker, boxes_from_results
+from roi_zoom import RoiZoomDetector
+from frame_profiler import FrameProfiler, NullProfiler
+from frame_ring import open_capture
+from overlay_renderer import OverlayRenderer
 
 # -----------------------------
 # ADVANCED DISTANCE DETECTION
 # -----------------------------
 
 class AdvancedDistanceDetector:
-    def __init__(self, model_path="best.pt", calibration_file="camera_calibration.json"):
+    def __init__(self, model_path="best.pt", calibration_file="camera_calibration.json",
+                 keyframe_interval=1, roi_zoom=False):
         """
         Advanced distance detection with multiple precision improvements:
         1. Camera calibration support
@@ -18,8 +27,16 @@ class AdvancedDistanceDetector:
         3. Multi-frame averaging
         4. Confidence-weighted measurements
         5. Adaptive focal length estimation
+        6. Optional keyframe mode (detect every N frames, propagate in between)
+        7. Optional crop-and-zoom mode (high-res re-inference of small objects)
+        
+        Pass model_path=None to use only the distance pipeline (e.g. for replay).
         """
-        self.model = YOLO(model_path)
+        self.model = None
+        if model_path:
+            # Imported here so model-free use doesn't need ultralytics/torch
+            from ultralytics import YOLO
+            self.model = YOLO(model_path)
         self.calibration_file = calibration_file
         
         # Default parameters
@@ -27,6 +44,12 @@ class AdvancedDistanceDetector:
         self.KNOWN_HEIGHT = 12.0
         self.FOCAL_LENGTH = 700
         
+        # Width/height blend and Kalman noise (tunable offline via replay)
+        self.WIDTH_WEIGHT = 0.6
+        self.HEIGHT_WEIGHT = 0.4
+        self.PROCESS_NOISE = 0.03
+        self.MEASUREMENT_NOISE = 0.1
+        
         # Camera calibration parameters
         self.camera_matrix = None
         self.dist_coeffs = None
@@ -41,6 +64,26 @@ class AdvancedDistanceDetector:
         # Tracking history
         self.object_history = {}
         
+        # Per-object state is dropped after this many frames without a detection
+        self.STALE_FRAMES = 30
+        self.frame_index = 0
+        self.last_seen = {}
+        
+        # Keyframe mode: YOLO runs every N frames, optical flow in between
+        self.keyframe_tracker = KeyframeTracker(keyframe_interval) if keyframe_interval > 1 else None
+        
+        # Crop-and-zoom mode: low-res candidates, high-res padded crops
+        self.roi_detector = RoiZoomDetector(self.model) if roi_zoom else None
+        
+        # Optional DetectionRecorder for offline replay
+        self.recorder = None
+        
+        # Per-stage timing (FrameProfiler when --profile is on)
+        self.profiler = NullProfiler()
+        
+        # Cached labels, batched boxes and a reused frame buffer
+        self.overlay = OverlayRenderer()
+        
     def load_calibration(self):
         """Load camera calibration data if available"""
         if os.path.exists(self.calibration_file):
@@ -55,12 +98,8 @@ class AdvancedDistanceDetector:
     
     def create_kalman_filter(self):
         """Create a Kalman filter for distance tracking"""
-        kf = cv2.KalmanFilter(2, 1)  # 2 state variables (distance, velocity), 1 measurement
-        kf.measurementMatrix = np.array([[1, 0]], np.float32)
-        kf.transitionMatrix = np.array([[1, 1], [0, 1]], np.float32)
-        kf.processNoiseCov = np.array([[1, 0], [0, 1]], np.float32) * 0.03
-        kf.measurementNoiseCov = np.array([[1]], np.float32) * 0.1
-        return kf
+        # 2 state variables (distance, velocity), 1 measurement
+        return DistanceKalman(self.PROCESS_NOISE, self.MEASUREMENT_NOISE)
     
     def calculate_distance_with_confidence(self, pixel_width, pixel_height, confidence):
         """
@@ -76,7 +115,7 @@ class AdvancedDistanceDetector:
         distance_height = (self.KNOWN_HEIGHT * self.FOCAL_LENGTH) / pixel_height
         
         # Weighted average (give more weight to width as it's typically more stable)
-        distance = (distance_width * 0.6 + distance_height * 0.4)
+        distance = (distance_width * self.WIDTH_WEIGHT + distance_height * self.HEIGHT_WEIGHT)
         
         # Apply confidence weighting
         confidence_factor = float(confidence)
@@ -85,28 +124,25 @@ class AdvancedDistanceDetector:
     
     def apply_kalman_filter(self, object_id, measurement):
         """Apply Kalman filtering to smooth measurements"""
-        if object_id not in self.kalman_filters:
-            self.kalman_filters[object_id] = self.create_kalman_filter()
-            self.kalman_filters[object_id].statePost = np.array([[measurement], [0]], np.float32)
-        
-        kf = self.kalman_filters[object_id]
-        
-        # Predict
-        prediction = kf.predict()
-        
-        # Update with measurement
-        kf.correct(np.array([[measurement]], np.float32))
+        kf = self.kalman_filters.get(object_id)
+        if kf is None:
+            kf = self.kalman_filters[object_id] = self.create_kalman_filter()
+            kf.distance = measurement
         
-        return float(kf.statePost[0])
+        # Predict + update with measurement
+        return kf.update(measurement)
     
     def multi_frame_average(self, measurements):
         """Calculate weighted average of recent measurements"""
         if not measurements:
             return None
         
-        # More recent measurements get higher weight
-        weights = np.linspace(0.5, 1.0, len(measurements))
-        weighted_avg = np.average(measurements, weights=weights)
+        # More recent measurements get higher weight (linearly from 0.5 to 1.0)
+        n = len(measurements)
+        if n == 1:
+            return float(measurements[0])
+        weights = [0.5 + 0.5 * i / (n - 1) for i in range(n)]
+        weighted_avg = sum(w * m for w, m in zip(weights, measurements)) / sum(weights)
         
         return weighted_avg
     
@@ -124,23 +160,138 @@ class AdvancedDistanceDetector:
     
     def calculate_bbox_stability(self, object_id, current_bbox):
         """Calculate how stable the bounding box is over time"""
-        if object_id not in self.object_history:
-            self.object_history[object_id] = deque(maxlen=5)
+        history = self.object_history.get(object_id)
+        if history is None:
+            history = self.object_history[object_id] = deque(maxlen=5)
         
-        self.object_history[object_id].append(current_bbox)
+        history.append(current_bbox)
         
-        if len(self.object_history[object_id]) < 2:
+        if len(history) < 2:
             return 0.5  # Default stability
         
-        # Calculate variance in bbox size
-        sizes = [bbox[2] * bbox[3] for bbox in self.object_history[object_id]]
-        stability = 1.0 / (1.0 + np.std(sizes) / np.mean(sizes))
+        # Calculate variance in bbox size (a handful of values: plain math beats numpy)
+        sizes = [bbox[2] * bbox[3] for bbox in history]
+        n = len(sizes)
+        mean = sum(sizes) / n
+        if mean == 0:
+            return 0.5  # Degenerate boxes, no distance is measured for them anyway
+        # Integer pixel areas, so the sum of squares is exact
+        variance = sum(map(operator.mul, sizes, sizes)) / n - mean * mean
+        std = math.sqrt(max(variance, 0.0))
+        stability = 1.0 / (1.0 + std / mean)
         
         return stability
     
-    def run(self, camera_index=0):
+    def process_detections(self, boxes):
+        """
+        Distance pipeline for one frame of (x1, y1, x2, y2, conf, cls) boxes.
+        Returns per-object ((x1, y1, x2, y2), conf, filtered_distance, quality_score)
+        and the multi-frame average distance (None if nothing was measured).
+        """
+        measurements = []
+        current_measurements = []
+        
+        for idx, box in enumerate(boxes):
+            x1, y1, x2, y2 = map(int, box[:4])
+            conf = box[4]
+            cls = box[5]
+            
+            # Calculate dimensions
+            pixel_width = x2 - x1
+            pixel_height = y2 - y1
+            
+            # Create object ID (simple tracking based on position)
+            object_id = f"obj_{cls}_{idx}"
+            self.last_seen[object_id] = self.frame_index
+            
+            # Calculate bbox stability
+            stability = self.calculate_bbox_stability(
+                object_id, (x1, y1, pixel_width, pixel_height)
+            )
+            
+            # Calculate distance with confidence
+            result = self.calculate_distance_with_confidence(
+                pixel_width, pixel_height, conf
+            )
+            
+            if result:
+                distance, confidence_factor = result
+                
+                # Apply Kalman filter
+                filtered_distance = self.apply_kalman_filter(object_id, distance)
+                
+                # Store measurement
+                current_measurements.append(filtered_distance)
+                
+                # Calculate quality score
+                quality_score = (confidence_factor * 0.5 + stability * 0.5) * 100
+                
+                measurements.append(((x1, y1, x2, y2), conf, filtered_distance, quality_score))
+        
+        # Update measurement buffer
+        overall_avg = None
+        if current_measurements:
+            avg_distance = self.multi_frame_average(current_measurements)
+            self.measurement_buffer.append(avg_distance)
+            overall_avg = sum(self.measurement_buffer) / len(self.measurement_buffer)
+        
+        self.prune_stale_objects()
+        self.frame_index += 1
+        
+        return measurements, overall_avg
+    
+    def prune_stale_objects(self):
+        """Forget Kalman filters and history of objects not seen for STALE_FRAMES frames"""
+        stale = [object_id for object_id, seen in self.last_seen.items()
+                 if self.frame_index - seen > self.STALE_FRAMES]
+        for object_id in stale:
+            del self.last_seen[object_id]
+            self.kalman_filters.pop(object_id, None)
+            self.object_history.pop(object_id, None)
+    
+    def detect_boxes(self, frame):
+        """Run YOLO and return (x1, y1, x2, y2, conf, cls) boxes"""
+        if self.roi_detector:
+            return self.roi_detector.detect(frame)
+        results = self.model(frame, conf=0.5)
+        return boxes_from_results(results)
+    
+    def draw_measurements(self, frame, measurements, overall_avg):
+        """Draw boxes colored by quality, per-object distances and the overall average"""
+        overlay = self.overlay
+        colors = []
+        boxes_by_color = {}
+        for (x1, y1, x2, y2), _, _, quality_score in measurements:
+            # Color based on quality (green=good, yellow=medium, red=poor)
+            if quality_score > 70:
+                color = (0, 255, 0)  # Green
+            elif quality_score > 50:
+                color = (0, 255, 255)  # Yellow
+            else:
+                color = (0, 0, 255)  # Red
+            colors.append(color)
+            boxes_by_color.setdefault(color, []).append((x1, y1, x2, y2))
+        
+        # Draw bounding boxes, one call per color
+        for color, rects in boxes_by_color.items():
+            overlay.draw_boxes(frame, rects, color, 2)
+        
+        for ((x1, y1, x2, y2), conf, filtered_distance, quality_score), color in zip(measurements, colors):
+            # Display information
+            label = f"Dist: {filtered_distance:.1f}cm | Q: {quality_score:.0f}%"
+            overlay.put_text(frame, label, (x1, y1 - 10), 0.6, color, 2)
+            
+            # Display confidence
+            overlay.put_text(frame, f"Conf: {conf:.2f}", (x1, y2 + 20), 0.5, color, 1)
+        
+        # Display overall average
+        if overall_avg is not None:
+            overlay.put_text(frame, f"Avg Distance: {overall_avg:.1f}cm",
+                             (10, 30), 0.8, (255, 255, 255), 2)
+    
+    def run(self, camera_index=0, headless=False, max_frames=None):
         """Main detection loop with advanced distance calculation"""
-        cap = cv2.VideoCapture(camera_index)
+        cap = open_capture(camera_index)
         
         # Set camera properties for better quality
         cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
@@ -151,110 +302,81 @@ class AdvancedDistanceDetector:
         print("Press 'ESC' to quit, 'C' to clear tracking history")
         
         frame_count = 0
-        
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
+        profiler = self.profiler
+        
+        try:
+            while max_frames is None or frame_count < max_frames:
+                profiler.begin_frame()
+                ret, frame = self.overlay.read(cap)
+                if not ret:
+                    break
+                profiler.mark('capture')
             
-            frame_count += 1
+                frame_count += 1
             
-            # Apply lens distortion correction
-            frame = self.undistort_frame(frame)
+                # Apply lens distortion correction
+                frame = self.undistort_frame(frame)
+                profiler.mark('undistort')
             
-            # Run YOLO inference
-            results = self.model(frame, conf=0.5)
+                # Run YOLO inference (or propagate boxes between keyframes)
+                if self.keyframe_tracker:
+                    boxes = self.keyframe_tracker.update(frame, self.detect_boxes)
+                else:
+                    boxes = self.detect_boxes(frame)
+                profiler.mark('detect')
             
-            current_measurements = []
+                if self.recorder:
+                    self.recorder.write_frame(time.time(), boxes)
             
-            for idx, box in enumerate(results[0].boxes):
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                conf = box.conf[0]
-                cls = int(box.cls[0])
-                
-                # Calculate dimensions
-                pixel_width = x2 - x1
-                pixel_height = y2 - y1
-                
-                # Create object ID (simple tracking based on position)
-                object_id = f"obj_{cls}_{idx}"
-                
-                # Calculate bbox stability
-                stability = self.calculate_bbox_stability(
-                    object_id, (x1, y1, pixel_width, pixel_height)
-                )
-                
-                # Calculate distance with confidence
-                result = self.calculate_distance_with_confidence(
-                    pixel_width, pixel_height, conf
-                )
-                
-                if result:
-                    distance, confidence_factor = result
-                    
-                    # Apply Kalman filter
-                    filtered_distance = self.apply_kalman_filter(object_id, distance)
-                    
-                    # Store measurement
-                    current_measurements.append(filtered_distance)
-                    
-                    # Calculate quality score
-                    quality_score = (confidence_factor * 0.5 + stability * 0.5) * 100
-                    
-                    # Color based on quality (green=good, yellow=medium, red=poor)
-                    if quality_score > 70:
-                        color = (0, 255, 0)  # Green
-                    elif quality_score > 50:
-                        color = (0, 255, 255)  # Yellow
-                    else:
-                        color = (0, 0, 255)  # Red
-                    
-                    # Draw bounding box
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                    
-                    # Display information
-                    label = f"Dist: {filtered_distance:.1f}cm | Q: {quality_score:.0f}%"
-                    cv2.putText(frame, label, (x1, y1 - 10),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-                    
-                    # Display confidence
-                    conf_label = f"Conf: {conf:.2f}"
-                    cv2.putText(frame, conf_label, (x1, y2 + 20),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+                measurements, overall_avg = self.process_detections(boxes)
+                profiler.mark('postprocess')
             
-            # Update measurement buffer
-            if current_measurements:
-                avg_distance = self.multi_frame_average(current_measurements)
-                self.measurement_buffer.append(avg_distance)
-                
-                # Display overall average
-                if len(self.measurement_buffer) > 0:
-                    overall_avg = np.mean(list(self.measurement_buffer))
-                    cv2.putText(frame, f"Avg Distance: {overall_avg:.1f}cm",
-                               (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+                self.draw_measurements(frame, measurements, overall_avg)
+            
+                # Display info panel
+                self.overlay.put_text(frame, f"Frame: {frame_count}", (10, 60), 0.6, (255, 255, 255), 1)
+                self.overlay.put_text(frame, f"Objects: {len(boxes)}", (10, 85), 0.6, (255, 255, 255), 1)
+                if self.keyframe_tracker:
+                    self.overlay.put_text(frame, f"Model calls: {self.keyframe_tracker.model_calls}", (10, 110),
+                                          0.6, (255, 255, 255), 1)
+                profiler.draw_overlay(frame)
+                profiler.mark('draw')
             
-            # Display info panel
-            cv2.putText(frame, f"Frame: {frame_count}", (10, 60),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
-            cv2.putText(frame, f"Objects: {len(results[0].boxes)}", (10, 85),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+                if headless:
+                    profiler.end_frame()
+                    continue
             
-            # Display the frame
-            cv2.imshow("Advanced Distance Detection", frame)
+                # Display the frame
+                cv2.imshow("Advanced Distance Detection", frame)
             
-            # Key controls
-            key = cv2.waitKey(1) & 0xFF
-            if key == 27:  # ESC
-                break
-            elif key == ord('c') or key == ord('C'):  # Clear history
-                self.kalman_filters.clear()
-                self.object_history.clear()
-                self.measurement_buffer.clear()
-                print("🔄 Tracking history cleared")
-        
-        cap.release()
-        cv2.destroyAllWindows()
+                # Key controls
+                key = cv2.waitKey(1) & 0xFF
+                profiler.mark('display')
+                profiler.end_frame()
+                if key == 27:  # ESC
+                    break
+                elif key == ord('c') or key == ord('C'):  # Clear history
+                    self.kalman_filters.clear()
+                    self.object_history.clear()
+                    self.last_seen.clear()
+                    self.measurement_buffer.clear()
+                    if self.keyframe_tracker:
+                        self.keyframe_tracker.reset()
+                    print("🔄 Tracking history cleared")
+        
+        finally:
+            cap.release()
+            # Also on errors, so buffered frames still reach the log
+            if self.recorder:
+                self.recorder.close()
+                print(f"✓ Recorded {self.recorder.frames} frames to {self.recorder.path}")
+        if not headless:
+            cv2.destroyAllWindows()
         print("✓ Detection stopped")
+        profiler.close()
+        
+        if self.keyframe_tracker:
+            self.keyframe_tracker.print_report()
 
 
 def create_calibration_file():
@@ -346,10 +468,32 @@ def create_calibration_file():
 
 
 if __name__ == "__main__":
-    import sys
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Advanced distance detection")
+    parser.add_argument("--calibrate", action="store_true", help="Run camera calibration")
+    parser.add_argument("--keyframe", type=int, default=1, metavar="N",
+                        help="Run YOLO every N frames and propagate boxes in between")
+    parser.add_argument("--roi-zoom", action="store_true",
+                        help="Low-res candidate pass plus high-res re-inference of padded crops")
+    parser.add_argument("--record", metavar="LOG",
+                        help="Record raw per-frame detections for offline replay")
+    parser.add_argument("--source", default="0", help="Camera index, video file or shm:NAME (frame_ring.py capture)")
+    parser.add_argument("--profile", action="store_true", help="Time each stage of the run loop")
+    parser.add_argument("--trace", metavar="FILE", help="With --profile, write a Chrome/Perfetto trace")
+    parser.add_argument("--headless", action="store_true", help="No window; log stage timings instead")
+    parser.add_argument("--max-frames", type=int, help="Stop after this many frames")
+    args = parser.parse_args()
     
-    if len(sys.argv) > 1 and sys.argv[1] == "--calibrate":
+    if args.calibrate:
         create_calibration_file()
     else:
-        detector = AdvancedDistanceDetector(model_path="best.pt")
-        detector.run(camera_index=0)
+        detector = AdvancedDistanceDetector(model_path="best.pt", keyframe_interval=args.keyframe,
+                                            roi_zoom=args.roi_zoom)
+        if args.record:
+            from detection_log import DetectionRecorder
+            detector.recorder = DetectionRecorder(args.record)
+        if args.profile:
+            detector.profiler = FrameProfiler(args.trace, log_every=100 if args.headless else 0)
+        source = int(args.source) if args.source.isdigit() else args.source
+        detector.run(camera_index=source, headless=args.headless, max_frames=args.max_frames)
@@ -1,25 +1,110 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
-from ultralytics import YOLO
 import cv2
 import numpy as np
 import base64
+import math
 from pathlib import Path
 import os
+import tempfile
+import threading
+from inference_queue import InferenceQueue, QueueFullError, DeadlineExceededError
+from session_store import SessionTable, FrameSkipper, WebcamSession, frame_fingerprint
+from session_tracking import tracked_detections
+from keyframe_tracker import boxes_from_results
+from history_store import DetectionHistory
+from model_loader import ModelLoader
+from video_stream import VideoJob, JobCancelled, format_sse, format_ndjson
+from image_sizing import decode_for_inference, inference_size, scale_box
+import atexit
 
 app = Flask(__name__, static_folder='frontend/build')
 CORS(app)
 
-model = YOLO("best.pt")
+# The model loads and warms up in the background; the server listens right away
+MODEL_PATH = 'best.pt'
+WARMUP_RUNS = 3
+
+model_loader = ModelLoader(MODEL_PATH, WARMUP_RUNS).start()
 
 UPLOAD_FOLDER = 'uploads'
 RESULTS_FOLDER = 'results'
 Path(UPLOAD_FOLDER).mkdir(exist_ok=True)
 Path(RESULTS_FOLDER).mkdir(exist_ok=True)
 
+# Only the most recent uploads are kept on disk
+MAX_UPLOADS = 500
+
+def prune_uploads():
+    """Delete the oldest uploaded files beyond MAX_UPLOADS"""
+    entries = [e for e in os.scandir(UPLOAD_FOLDER) if e.is_file()]
+    if len(entries) <= MAX_UPLOADS:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    for entry in entries[:len(entries) - MAX_UPLOADS]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass  # Already removed by a concurrent request
+
+# Every detection is appended (off the request path) to an indexed SQLite log
+history = DetectionHistory(os.path.join(RESULTS_FOLDER, 'detections.db'))
+atexit.register(history.close)
+
+# Admission control: webcam frames go stale quickly, uploads can wait longer
+QUEUE_LIMITS = {'webcam': 4, 'upload': 16, 'video': 4}
+REQUEST_DEADLINES = {'webcam': 1.0, 'upload': 30.0, 'video': 5.0}
+
+# Model input size; uploads smaller than this are inferred at their own size
+INFERENCE_SIZE = 640
+# Large JPEG uploads are decoded at 1/2, 1/4 or 1/8 scale, keeping the long side at least this
+UPLOAD_TARGET_SIZE = 640
+
+def predict(payload):
+    source, imgsz = payload
+    return model_loader.model(source, conf=0.25, imgsz=imgsz)
+
+inference_queue = InferenceQueue(predict, QUEUE_LIMITS)
+
+def request_deadline(priority):
+    """Deadline in seconds, optionally tightened by an X-Deadline-Ms header"""
+    deadline = REQUEST_DEADLINES[priority]
+    header = request.headers.get('X-Deadline-Ms')
+    if header and header.isdigit():
+        deadline = min(deadline, int(header) / 1000.0)
+    return deadline
+
+def overloaded(retry_after):
+    return jsonify({'error': 'Server busy, retry later'}), 503, {'Retry-After': str(retry_after)}
+
+def not_ready():
+    """503 while the model is still loading (or failed to load)"""
+    startup = model_loader.snapshot()
+    error = 'Model failed to load' if startup['state'] == 'failed' else 'Model is warming up, retry later'
+    return jsonify({'error': error, 'startup': startup}), 503, {'Retry-After': '1'}
+
+def run_inference(priority, source, imgsz=INFERENCE_SIZE):
+    """Run the model through the admission-controlled queue"""
+    return inference_queue.submit(priority, (source, imgsz), request_deadline(priority))
+
+# Webcam sessions: static scenes reuse the last response instead of running YOLO
+FRAME_CHANGE_THRESHOLD = 0.02   # mean thumbnail difference (0-1) that counts as a change
+MAX_CACHED_RESPONSE_AGE = 2.0   # seconds before a frame is re-processed regardless
+MAX_SESSIONS = 5000
+SESSION_TTL = 300.0
+
+webcam_sessions = SessionTable(MAX_SESSIONS, SESSION_TTL)
+frame_skipper = FrameSkipper(webcam_sessions, FRAME_CHANGE_THRESHOLD, MAX_CACHED_RESPONSE_AGE)
+
 @app.route('/api/detect', methods=['POST'])
 def detect_image():
     try:
+        # Shed load before parsing the request body
+        if not model_loader.is_ready():
+            return not_ready()
+        if inference_queue.is_full('upload'):
+            return overloaded(inference_queue.reject('upload'))
+        
         if 'image' not in request.files:
             return jsonify({'error': 'No image provided'}), 400
         
@@ -27,10 +112,19 @@ def detect_image():
         if file.filename == '':
             return jsonify({'error': 'No selected file'}), 400
         
+        data = file.read()
         filepath = os.path.join(UPLOAD_FOLDER, file.filename)
-        file.save(filepath)
+        with open(filepath, 'wb') as f:
+            f.write(data)
+        prune_uploads()
         
-        results = model(filepath, conf=0.25)
+        # Decode no larger than the model needs; boxes are scaled back to the original
+        image, scale, size = decode_for_inference(data, UPLOAD_TARGET_SIZE)
+        if image is None:
+            return jsonify({'error': 'Could not decode image'}), 400
+        width, height = size
+        
+        results = run_inference('upload', image, inference_size(image, INFERENCE_SIZE))
         
         annotated_img = results[0].plot()
         
@@ -42,24 +136,36 @@ def detect_image():
             detections.append({
                 'class': results[0].names[int(box.cls[0])],
                 'confidence': float(box.conf[0]),
-                'bbox': box.xyxy[0].tolist()
+                'bbox': scale_box(box.xyxy[0].tolist(), scale)
             })
         
+        history.record('upload', detections)
+        
         return jsonify({
             'success': True,
             'image': f'data:image/jpeg;base64,{img_base64}',
             'detections': detections,
-            'count': len(detections)
+            'count': len(detections),
+            'width': width,
+            'height': height
         })
     
+    except QueueFullError as e:
+        return overloaded(e.retry_after)
+    except DeadlineExceededError as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/detect-webcam', methods=['POST'])
 def detect_webcam():
     try:
+        if not model_loader.is_ready():
+            return not_ready()
+        
         data = request.get_json()
         image_data = data.get('image', '')
+        session_id = data.get('session_id')
         
         if not image_data:
             return jsonify({'error': 'No image data'}), 400
@@ -68,34 +174,186 @@ def detect_webcam():
         nparr = np.frombuffer(img_data, np.uint8)
         frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
         
-        results = model(frame, conf=0.25)
-        
-        annotated_frame = results[0].plot()
+        # Without a session id the request is stateless (no frame skipping, fresh
+        # tracks): keying by address would merge clients behind one NAT or proxy
+        if session_id:
+            session = webcam_sessions.get(session_id)
+            fingerprint = frame_fingerprint(frame)
+        else:
+            session, fingerprint = WebcamSession(), None
         
-        _, buffer = cv2.imencode('.jpg', annotated_frame)
-        img_base64 = base64.b64encode(buffer).decode('utf-8')
-        
-        detections = []
-        for box in results[0].boxes:
-            detections.append({
-                'class': results[0].names[int(box.cls[0])],
-                'confidence': float(box.conf[0]),
-                'bbox': box.xyxy[0].tolist()
-            })
+        with session.lock:
+            if session_id:
+                cached = frame_skipper.cached_response(session, fingerprint)
+                if cached is not None:
+                    return jsonify(dict(cached, cached=True))
+            
+            if inference_queue.is_full('webcam'):
+                return overloaded(inference_queue.reject('webcam'))
+            
+            results = run_inference('webcam', frame)
+            
+            annotated_frame = results[0].plot()
+            
+            _, buffer = cv2.imencode('.jpg', annotated_frame)
+            img_base64 = base64.b64encode(buffer).decode('utf-8')
+            
+            boxes = boxes_from_results(results)
+            tracked = session.tracker.update(boxes)
+            
+            detections = tracked_detections(boxes, tracked, results[0].names)
+            
+            history.record('webcam', detections)
+            
+            response = {
+                'success': True,
+                'image': f'data:image/jpeg;base64,{img_base64}',
+                'detections': detections,
+                'count': len(detections)
+            }
+            # Cache without the annotated image to keep sessions small;
+            # clients keep showing their last image for cached responses
+            if session_id:
+                frame_skipper.store(session, fingerprint,
+                                    {k: v for k, v in response.items() if k != 'image'})
         
-        return jsonify({
-            'success': True,
-            'image': f'data:image/jpeg;base64,{img_base64}',
-            'detections': detections,
-            'count': len(detections)
-        })
+        return jsonify(dict(response, cached=False))
     
+    except QueueFullError as e:
+        return overloaded(e.retry_after)
+    except DeadlineExceededError as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Video jobs: frames are batched per model call at the lowest priority
+VIDEO_BATCH_SIZE = 8
+MAX_VIDEO_JOBS = 2
+
+video_slots = threading.BoundedSemaphore(MAX_VIDEO_JOBS)
+
+def run_video_batch(frames, cancelled):
+    """
+    Inference for a batch of video frames. Video is the lowest class, so a full
+    queue or an expired deadline means "try again", not failure; the deadline
+    only bounds each attempt so a cancelled job notices within a few seconds.
+    """
+    while not cancelled.is_set():
+        try:
+            return inference_queue.submit('video', (frames, INFERENCE_SIZE), REQUEST_DEADLINES['video'])
+        except QueueFullError as e:
+            cancelled.wait(e.retry_after)
+        except DeadlineExceededError:
+            pass  # Starved by webcam/upload traffic; queue it again
+    raise JobCancelled()
+
+@app.route('/api/detect-video', methods=['POST'])
+def detect_video():
+    if not model_loader.is_ready():
+        return not_ready()
+    
+    if 'video' not in request.files:
+        return jsonify({'error': 'No video provided'}), 400
+    
+    file = request.files['video']
+    if file.filename == '':
+        return jsonify({'error': 'No selected file'}), 400
+    
+    try:
+        stride = max(1, int(request.values.get('stride', 1)))
+    except ValueError:
+        return jsonify({'error': 'stride must be an integer'}), 400
+    
+    # SSE if asked for (format=sse or Accept: text/event-stream), JSON lines otherwise
+    fmt = request.values.get('format')
+    if fmt is None:
+        fmt = 'sse' if 'text/event-stream' in request.headers.get('Accept', '') else 'ndjson'
+    if fmt not in ('sse', 'ndjson'):
+        return jsonify({'error': 'format must be sse or ndjson'}), 400
+    
+    if not video_slots.acquire(blocking=False):
+        return overloaded(5)
+    
+    try:
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(file.filename)[1] or '.mp4')
+        os.close(fd)
+        file.save(path)
+    except Exception as e:
+        video_slots.release()
+        return jsonify({'error': str(e)}), 500
+    
+    job = VideoJob(path, lambda frames: run_video_batch(frames, job.cancelled), stride, VIDEO_BATCH_SIZE,
+                   on_detections=lambda detections: history.record('video', detections))
+    job.start()
+    formatter = format_sse if fmt == 'sse' else format_ndjson
+    
+    def stream():
+        for event, data in job.events():
+            yield formatter(event, data)
+    
+    def finish():
+        # The slot stays taken until both job threads have really exited
+        job.join()
+        os.remove(path)
+        video_slots.release()
+    
+    def cleanup():
+        # Runs when the response closes, including client disconnects
+        job.cancel()
+        threading.Thread(target=finish, name="video-cleanup", daemon=True).start()
+    
+    response = Response(stream(), mimetype='text/event-stream' if fmt == 'sse' else 'application/x-ndjson',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(cleanup)
+    return response
+
+def parse_timestamp(name):
+    """Optional Unix-seconds query parameter; malformed values are a ValueError, not ignored"""
+    value = request.args.get(name)
+    if value is None:
+        return None
+    ts = float(value)
+    if not math.isfinite(ts):
+        raise ValueError(f'{name} must be a finite number')
+    return ts
+
+@app.route('/api/results', methods=['GET'])
+def query_results():
+    try:
+        limit = int(request.args.get('limit', 100))
+        if limit < 1:
+            raise ValueError('limit must be at least 1')
+        limit = min(limit, 1000)
+        start = parse_timestamp('start')
+        end = parse_timestamp('end')
+        rows, next_cursor = history.query(
+            start=start, end=end, cls=request.args.get('class'),
+            limit=limit, cursor=request.args.get('cursor')
+        )
+        return jsonify({'results': rows, 'count': len(rows), 'next_cursor': next_cursor})
+    
+    except ValueError as e:
+        return jsonify({'error': f'Invalid query: {e}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/live', methods=['GET'])
+def live():
+    """Liveness: the process is up and serving, whether or not the model is ready"""
+    return jsonify({'status': 'alive'})
+
 @app.route('/api/health', methods=['GET'])
 def health():
-    return jsonify({'status': 'ok', 'model': 'best.pt'})
+    """Readiness: 200 only once the model has loaded and warmed up"""
+    ready = model_loader.is_ready()
+    return jsonify({
+        'status': 'ok' if ready else model_loader.state,
+        'model': MODEL_PATH,
+        'startup': model_loader.snapshot(),
+        'queue': inference_queue.snapshot(),
+        'frame_skip': frame_skipper.snapshot(),
+        'history': history.snapshot()
+    }), 200 if ready else 503
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
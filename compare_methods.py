@@ -1,23 +1,39 @@
-from ultralytics import YOLO
 import cv2
 import numpy as np
 import time
 from collections import deque
+from distance_kalman import DistanceKalman
+from keyframe_tracker import KeyframeTracker, boxes_from_results
+from frame_profiler import FrameProfiler, NullProfiler
+from frame_ring import open_capture
+from overlay_renderer import OverlayRenderer
 
 # --------------------------------
 # DISTANCE METHODS COMPARISON
 # --------------------------------
 
 class DistanceComparison:
-    def __init__(self, model_path="best.pt"):
-        """Compare all three distance calculation methods side-by-side"""
-        self.model = YOLO(model_path)
+    def __init__(self, model_path="best.pt", keyframe_interval=1):
+        """
+        Compare all three distance calculation methods side-by-side.
+        Pass model_path=None to use only the distance methods (e.g. for replay).
+        """
+        self.model = None
+        if model_path:
+            # Imported here so model-free use doesn't need ultralytics/torch
+            from ultralytics import YOLO
+            self.model = YOLO(model_path)
         
         # Parameters
         self.KNOWN_WIDTH = 4.0
         self.KNOWN_HEIGHT = 12.0
         self.FOCAL_LENGTH = 700
         
+        # Filter settings (tunable offline via replay)
+        self.SMOOTHING = 0.9
+        self.PROCESS_NOISE = 0.03
+        self.MEASUREMENT_NOISE = 0.1
+        
         # Method 1: Basic smoothing
         self.smooth_distance_basic = 0
         
@@ -29,16 +45,25 @@ class DistanceComparison:
         
         # Performance tracking
         self.fps_counter = deque(maxlen=30)
-        self.method_times = {'basic': [], 'kalman': [], 'buffered': []}
+        # Rolling window of per-call timings (bounded for long-running sessions)
+        self.method_times = {method: deque(maxlen=100) for method in ('basic', 'kalman', 'buffered')}
+        
+        # Keyframe mode: YOLO runs every N frames, optical flow in between
+        self.keyframe_tracker = KeyframeTracker(keyframe_interval) if keyframe_interval > 1 else None
+        
+        # Optional DetectionRecorder for offline replay
+        self.recorder = None
+        
+        # Per-stage timing (FrameProfiler when --profile is on)
+        self.profiler = NullProfiler()
+        
+        # Frame and comparison panel share one reused buffer
+        self.PANEL_HEIGHT = 200
+        self.overlay = OverlayRenderer()
         
     def create_kalman_filter(self):
         """Create Kalman filter for distance tracking"""
-        kf = cv2.KalmanFilter(2, 1)
-        kf.measurementMatrix = np.array([[1, 0]], np.float32)
-        kf.transitionMatrix = np.array([[1, 1], [0, 1]], np.float32)
-        kf.processNoiseCov = np.array([[1, 0], [0, 1]], np.float32) * 0.03
-        kf.measurementNoiseCov = np.array([[1]], np.float32) * 0.1
-        return kf
+        return DistanceKalman(self.PROCESS_NOISE, self.MEASUREMENT_NOISE)
     
     def method_basic(self, pixel_width):
         """Method 1: Basic smoothing (from distanceWebcam.py)"""
@@ -50,7 +75,8 @@ class DistanceComparison:
             if self.smooth_distance_basic == 0:
                 self.smooth_distance_basic = distance
             else:
-                self.smooth_distance_basic = (self.smooth_distance_basic * 0.9) + (distance * 0.1)
+                self.smooth_distance_basic = (self.smooth_distance_basic * self.SMOOTHING) + \
+                                             (distance * (1 - self.SMOOTHING))
             
             result = self.smooth_distance_basic
         else:
@@ -66,13 +92,8 @@ class DistanceComparison:
         if pixel_width > 0:
             distance = (self.KNOWN_WIDTH * self.FOCAL_LENGTH) / pixel_width
             
-            # Predict
-            self.kalman_filter.predict()
-            
-            # Update with measurement
-            self.kalman_filter.correct(np.array([[distance]], np.float32))
-            
-            result = float(self.kalman_filter.statePost[0])
+            # Predict + update with measurement
+            result = self.kalman_filter.update(distance)
         else:
             result = None
         
@@ -88,9 +109,10 @@ class DistanceComparison:
             self.measurement_buffer.append(distance)
             
             # Weighted average (recent measurements get higher weight)
-            if len(self.measurement_buffer) > 0:
-                weights = np.linspace(0.5, 1.0, len(self.measurement_buffer))
-                result = np.average(list(self.measurement_buffer), weights=weights)
+            n = len(self.measurement_buffer)
+            if n > 1:
+                weights = [0.5 + 0.5 * i / (n - 1) for i in range(n)]
+                result = sum(w * m for w, m in zip(weights, self.measurement_buffer)) / sum(weights)
             else:
                 result = distance
         else:
@@ -105,19 +127,19 @@ class DistanceComparison:
         for method, times in self.method_times.items():
             if times:
                 stats[method] = {
-                    'avg_time': np.mean(times[-100:]) * 1000,  # Convert to ms
-                    'std_dev': np.std(times[-100:]) * 1000
+                    'avg_time': np.mean(times) * 1000,  # Convert to ms
+                    'std_dev': np.std(times) * 1000
                 }
         return stats
     
     def draw_comparison_panel(self, frame, distances, stats):
-        """Draw side-by-side comparison panel"""
-        panel_height = 200
-        panel = np.zeros((panel_height, frame.shape[1], 3), dtype=np.uint8)
+        """Draw side-by-side comparison panel (into the buffer below the frame)"""
+        panel_height = self.PANEL_HEIGHT
+        overlay = self.overlay
+        panel = overlay.panel(frame, panel_height)
         
         # Title
-        cv2.putText(panel, "Distance Methods Comparison", (10, 30),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+        overlay.put_text(panel, "Distance Methods Comparison", (10, 30), 0.8, (255, 255, 255), 2)
         
         # Method results
         y_offset = 70
@@ -131,35 +153,51 @@ class DistanceComparison:
             x_offset = 10 + (i * 400)
             
             # Method name
-            cv2.putText(panel, name, (x_offset, y_offset),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+            overlay.put_text(panel, name, (x_offset, y_offset), 0.6, color, 2)
             
             # Distance value
             if dist is not None:
-                cv2.putText(panel, f"{dist:.1f} cm", (x_offset, y_offset + 30),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+                overlay.put_text(panel, f"{dist:.1f} cm", (x_offset, y_offset + 30), 0.8, color, 2)
             else:
-                cv2.putText(panel, "N/A", (x_offset, y_offset + 30),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (128, 128, 128), 2)
+                overlay.put_text(panel, "N/A", (x_offset, y_offset + 30), 0.8, (128, 128, 128), 2)
             
             # Performance stats
             method_key = list(self.method_times.keys())[i]
             if method_key in stats:
                 perf_text = f"{stats[method_key]['avg_time']:.2f}ms"
-                cv2.putText(panel, perf_text, (x_offset, y_offset + 60),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 200, 200), 1)
+                overlay.put_text(panel, perf_text, (x_offset, y_offset + 60), 0.5, (200, 200, 200), 1)
         
         # FPS
         if self.fps_counter:
             fps = len(self.fps_counter) / sum(self.fps_counter)
-            cv2.putText(panel, f"FPS: {fps:.1f}", (10, panel_height - 20),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+            overlay.put_text(panel, f"FPS: {fps:.1f}", (10, panel_height - 20), 0.6, (255, 255, 255), 2)
         
         return panel
     
-    def run(self, camera_index=0):
+    def process_detections(self, boxes):
+        """Run all three methods on the first detected object of one frame"""
+        distances = {'basic': None, 'kalman': None, 'buffered': None}
+        
+        # Process first detected object
+        if len(boxes) > 0:
+            x1, y1, x2, y2 = map(int, boxes[0][:4])
+            pixel_width = x2 - x1
+            
+            # Calculate distance using all three methods
+            distances['basic'] = self.method_basic(pixel_width)
+            distances['kalman'] = self.method_kalman(pixel_width)
+            distances['buffered'] = self.method_buffered(pixel_width)
+        
+        return distances
+    
+    def detect_boxes(self, frame):
+        """Run YOLO and return (x1, y1, x2, y2, conf, cls) boxes"""
+        results = self.model(frame, conf=0.5)
+        return boxes_from_results(results)
+    
+    def run(self, camera_index=0, headless=False, max_frames=None):
         """Run comparison demo"""
-        cap = cv2.VideoCapture(camera_index)
+        cap = open_capture(camera_index)
         
         print("=" * 60)
         print("🔍 Distance Detection Methods Comparison")
@@ -172,67 +210,91 @@ class DistanceComparison:
         print("Press 'ESC' to quit, 'R' to reset filters")
         print("=" * 60)
         
-        while True:
-            frame_start = time.time()
+        profiler = self.profiler
+        frame_count = 0
+        
+        try:
+            while max_frames is None or frame_count < max_frames:
+                frame_start = time.time()
+                profiler.begin_frame()
             
-            ret, frame = cap.read()
-            if not ret:
-                break
+                # Decoded straight into the top of the frame + panel buffer
+                ret, frame = self.overlay.read(cap, self.PANEL_HEIGHT)
+                if not ret:
+                    break
+                profiler.mark('capture')
+                frame_count += 1
             
-            # Run YOLO detection
-            results = self.model(frame, conf=0.5)
+                # Run YOLO detection (or propagate boxes between keyframes)
+                if self.keyframe_tracker:
+                    boxes = self.keyframe_tracker.update(frame, self.detect_boxes)
+                else:
+                    boxes = self.detect_boxes(frame)
+                profiler.mark('detect')
             
-            distances = {'basic': None, 'kalman': None, 'buffered': None}
+                if self.recorder:
+                    self.recorder.write_frame(time.time(), boxes)
             
-            # Process first detected object
-            if len(results[0].boxes) > 0:
-                box = results[0].boxes[0]
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                pixel_width = x2 - x1
-                
-                # Calculate distance using all three methods
-                distances['basic'] = self.method_basic(pixel_width)
-                distances['kalman'] = self.method_kalman(pixel_width)
-                distances['buffered'] = self.method_buffered(pixel_width)
+                distances = self.process_detections(boxes)
+            
+                # Calculate statistics
+                stats = self.calculate_statistics()
+                profiler.mark('postprocess')
+            
+                if len(boxes) > 0:
+                    x1, y1, x2, y2 = map(int, boxes[0][:4])
                 
-                # Draw bounding boxes with different colors
-                colors = [(0, 255, 0), (255, 255, 0), (0, 255, 255)]
-                for i, (method, dist) in enumerate(distances.items()):
-                    if dist is not None:
-                        offset = i * 3
-                        cv2.rectangle(frame, 
-                                    (x1 + offset, y1 + offset), 
-                                    (x2 + offset, y2 + offset), 
-                                    colors[i], 2)
-            
-            # Calculate statistics
-            stats = self.calculate_statistics()
-            
-            # Draw comparison panel
-            panel = self.draw_comparison_panel(frame, distances, stats)
-            
-            # Combine frame and panel
-            combined = np.vstack([frame, panel])
-            
-            # Display
-            cv2.imshow("Distance Methods Comparison", combined)
-            
-            # Track FPS
-            frame_time = time.time() - frame_start
-            self.fps_counter.append(frame_time)
-            
-            # Key controls
-            key = cv2.waitKey(1) & 0xFF
-            if key == 27:  # ESC
-                break
-            elif key == ord('r') or key == ord('R'):  # Reset
-                self.smooth_distance_basic = 0
-                self.kalman_filter = self.create_kalman_filter()
-                self.measurement_buffer.clear()
-                print("🔄 Filters reset")
-        
-        cap.release()
-        cv2.destroyAllWindows()
+                    # Draw bounding boxes with different colors
+                    colors = [(0, 255, 0), (255, 255, 0), (0, 255, 255)]
+                    for i, (method, dist) in enumerate(distances.items()):
+                        if dist is not None:
+                            offset = i * 3
+                            self.overlay.draw_boxes(frame, [(x1 + offset, y1 + offset, x2 + offset, y2 + offset)],
+                                                    colors[i], 2)
+            
+                # Draw comparison panel
+                self.draw_comparison_panel(frame, distances, stats)
+            
+                # Frame and panel are already one image; no copy needed
+                combined = self.overlay.compose(frame, self.PANEL_HEIGHT)
+                profiler.draw_overlay(combined)
+                profiler.mark('draw')
+            
+                if headless:
+                    self.fps_counter.append(time.time() - frame_start)
+                    profiler.end_frame()
+                    continue
+            
+                # Display
+                cv2.imshow("Distance Methods Comparison", combined)
+            
+                # Track FPS
+                frame_time = time.time() - frame_start
+                self.fps_counter.append(frame_time)
+            
+                # Key controls
+                key = cv2.waitKey(1) & 0xFF
+                profiler.mark('display')
+                profiler.end_frame()
+                if key == 27:  # ESC
+                    break
+                elif key == ord('r') or key == ord('R'):  # Reset
+                    self.smooth_distance_basic = 0
+                    self.kalman_filter = self.create_kalman_filter()
+                    self.measurement_buffer.clear()
+                    if self.keyframe_tracker:
+                        self.keyframe_tracker.reset()
+                    print("🔄 Filters reset")
+        
+        finally:
+            cap.release()
+            # Also on errors, so buffered frames still reach the log
+            if self.recorder:
+                self.recorder.close()
+                print(f"✓ Recorded {self.recorder.frames} frames to {self.recorder.path}")
+        if not headless:
+            cv2.destroyAllWindows()
+        profiler.close()
         
         # Print final statistics
         print("\n" + "=" * 60)
@@ -242,8 +304,31 @@ class DistanceComparison:
         for method, data in stats.items():
             print(f"{method.upper():15} | Avg: {data['avg_time']:.3f}ms | StdDev: {data['std_dev']:.3f}ms")
         print("=" * 60)
+        
+        if self.keyframe_tracker:
+            self.keyframe_tracker.print_report()
 
 
 if __name__ == "__main__":
-    comparator = DistanceComparison(model_path="best.pt")
-    comparator.run(camera_index=0)
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Distance methods comparison")
+    parser.add_argument("--keyframe", type=int, default=1, metavar="N",
+                        help="Run YOLO every N frames and propagate boxes in between")
+    parser.add_argument("--record", metavar="LOG",
+                        help="Record raw per-frame detections for offline replay")
+    parser.add_argument("--source", default="0", help="Camera index, video file or shm:NAME (frame_ring.py capture)")
+    parser.add_argument("--profile", action="store_true", help="Time each stage of the run loop")
+    parser.add_argument("--trace", metavar="FILE", help="With --profile, write a Chrome/Perfetto trace")
+    parser.add_argument("--headless", action="store_true", help="No window; log stage timings instead")
+    parser.add_argument("--max-frames", type=int, help="Stop after this many frames")
+    args = parser.parse_args()
+    
+    comparator = DistanceComparison(model_path="best.pt", keyframe_interval=args.keyframe)
+    if args.record:
+        from detection_log import DetectionRecorder
+        comparator.recorder = DetectionRecorder(args.record)
+    if args.profile:
+        comparator.profiler = FrameProfiler(args.trace, log_every=100 if args.headless else 0)
+    source = int(args.source) if args.source.isdigit() else args.source
+    comparator.run(camera_index=source, headless=args.headless, max_frames=args.max_frames)
@@ -1,13 +1,17 @@
 import cv2
 import numpy as np
 from ultralytics import YOLO
+from keyframe_tracker import KeyframeTracker, boxes_from_results
+from frame_profiler import FrameProfiler, NullProfiler
+from frame_ring import open_capture
+from overlay_renderer import OverlayRenderer
 
 # --------------------------------
 # DEPTH FUSION DETECTION
 # --------------------------------
 
 class DepthFusionDetector:
-    def __init__(self, model_path="best.pt"):
+    def __init__(self, model_path="best.pt", keyframe_interval=1):
         self.yolo_model = YOLO(model_path)
         
         # Load MiDaS depth estimation model
@@ -25,6 +29,15 @@ class DepthFusionDetector:
         # Hybrid weights (geometric vs depth model)
         self.geometric_weight = 0.7
         self.depth_weight = 0.3
+        
+        # Keyframe mode: YOLO runs every N frames, optical flow in between
+        self.keyframe_tracker = KeyframeTracker(keyframe_interval) if keyframe_interval > 1 else None
+        
+        # Per-stage timing (FrameProfiler when --profile is on)
+        self.profiler = NullProfiler()
+        
+        # Cached labels, batched boxes and a reused frame buffer
+        self.overlay = OverlayRenderer()
 
     def detect_reference_markers(self, frame):
         """Detect Aruco markers for real-world scaling"""
@@ -91,57 +104,105 @@ class DepthFusionDetector:
         
         return hybrid_dist
 
-    def run(self):
-        cap = cv2.VideoCapture(0)
+    def detect_boxes(self, frame):
+        """Run YOLO and return (x1, y1, x2, y2, conf, cls) boxes"""
+        results = self.yolo_model(frame, conf=0.5)
+        return boxes_from_results(results)
+
+    def run(self, camera_index=0, headless=False, max_frames=None):
+        cap = open_capture(camera_index)
         
         print("🚀 Depth Fusion Detection Started")
         print("Press 'ESC' to quit")
         
-        while True:
-            ret, frame = cap.read()
+        profiler = self.profiler
+        frame_count = 0
+        
+        while max_frames is None or frame_count < max_frames:
+            profiler.begin_frame()
+            ret, frame = self.overlay.read(cap)
             if not ret:
                 break
+            profiler.mark('capture')
+            frame_count += 1
             
             # Step 1: Detect reference markers
             ref_distance = self.detect_reference_markers(frame)
+            profiler.mark('markers')
             
             # Step 2: Generate depth map
             depth_map = self.estimate_depth_map(frame)
+            profiler.mark('depth')
             
-            # Step 3: Run YOLO detection
-            results = self.yolo_model(frame, conf=0.5)
+            # Step 3: Run YOLO detection (or propagate boxes between keyframes)
+            if self.keyframe_tracker:
+                boxes = self.keyframe_tracker.update(frame, self.detect_boxes)
+            else:
+                boxes = self.detect_boxes(frame)
+            profiler.mark('detect')
             
-            for box in results[0].boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                conf = box.conf[0]
-                
-                # Step 4: Calculate hybrid distance
+            # Step 4: Calculate hybrid distance
+            distances = []
+            for box in boxes:
+                x1, y1, x2, y2 = map(int, box[:4])
                 distance = self.calculate_hybrid_distance(
                     (x1, y1, x2, y2), depth_map, ref_distance
                 )
-                
-                # Draw bounding box
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                
+                distances.append(((x1, y1, x2, y2), distance))
+            profiler.mark('postprocess')
+            
+            # Draw bounding boxes
+            self.overlay.draw_boxes(frame, [box for box, _ in distances], (0, 255, 0), 2)
+            
+            for (x1, y1, x2, y2), distance in distances:
                 # Display distance
                 label = f"Dist: {distance:.1f}cm"
-                cv2.putText(frame, label, (x1, y1 - 10),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+                self.overlay.put_text(frame, label, (x1, y1 - 10), 0.7, (0, 255, 0), 2)
             
             # Display depth map
             depth_display = cv2.applyColorMap(
                 depth_map.astype(np.uint8), cv2.COLORMAP_JET
             )
+            profiler.draw_overlay(frame)
+            profiler.mark('draw')
+            
+            if headless:
+                profiler.end_frame()
+                continue
+            
             cv2.imshow("Depth Map", depth_display)
             cv2.imshow("Depth Fusion Detection", frame)
             
-            if cv2.waitKey(1) & 0xFF == 27:
+            key = cv2.waitKey(1) & 0xFF
+            profiler.mark('display')
+            profiler.end_frame()
+            if key == 27:
                 break
         
         cap.release()
-        cv2.destroyAllWindows()
+        if not headless:
+            cv2.destroyAllWindows()
+        profiler.close()
+        
+        if self.keyframe_tracker:
+            self.keyframe_tracker.print_report()
 
 
 if __name__ == "__main__":
-    detector = DepthFusionDetector()
-    detector.run()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Depth fusion detection")
+    parser.add_argument("--keyframe", type=int, default=1, metavar="N",
+                        help="Run YOLO every N frames and propagate boxes in between")
+    parser.add_argument("--source", default="0", help="Camera index, video file or shm:NAME (frame_ring.py capture)")
+    parser.add_argument("--profile", action="store_true", help="Time each stage of the run loop")
+    parser.add_argument("--trace", metavar="FILE", help="With --profile, write a Chrome/Perfetto trace")
+    parser.add_argument("--headless", action="store_true", help="No window; log stage timings instead")
+    parser.add_argument("--max-frames", type=int, help="Stop after this many frames")
+    args = parser.parse_args()
+    
+    detector = DepthFusionDetector(keyframe_interval=args.keyframe)
+    if args.profile:
+        detector.profiler = FrameProfiler(args.trace, log_every=100 if args.headless else 0)
+    source = int(args.source) if args.source.isdigit() else args.source
+    detector.run(camera_index=source, headless=args.headless, max_frames=args.max_frames)
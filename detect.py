@@ -1,14 +1,282 @@
-from ultralytics import YOLO
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
-# Load trained model
-model = YOLO("best.pt")
+import cv2
 
-# Run detection on image
-results = model(
-    source="z.png",   # image path
-    conf=0.25,
-    save=True,
-    show=True
-)
+# --------------------------------
+# BULK IMAGE DETECTION
+# --------------------------------
 
-print("Detection done on image.")
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff'}
+
+
+def iter_inputs(inputs):
+    """
+    Expand inputs lazily into image paths. Each input can be:
+    a file, a directory (recursive), a glob pattern or @list.txt (one path per line).
+    """
+    for item in inputs:
+        if item.startswith('@'):
+            with open(item[1:], 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        yield line
+        elif os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                        yield os.path.join(root, name)
+        elif glob.has_magic(item):
+            yield from sorted(glob.iglob(item, recursive=True))
+        else:
+            yield item
+
+
+class JsonlWriter:
+    """One JSON record per image, appended so interrupted runs can resume"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def done_paths(self):
+        done = set()
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        done.add(json.loads(line)['path'])
+                    except (ValueError, KeyError):
+                        pass  # Truncated last line from an interrupted run
+        return done
+
+    def open(self):
+        self.drop_partial_line()
+        self.file = open(self.path, 'a')
+
+    def drop_partial_line(self):
+        """Truncate a half-written last record so the next one starts on its own line"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r+b') as f:
+            end = f.seek(0, os.SEEK_END)
+            pos = end
+            while pos > 0:
+                step = min(pos, 65536)
+                f.seek(pos - step)
+                newline = f.read(step).rfind(b"\n")
+                if newline >= 0:
+                    pos = pos - step + newline + 1
+                    break
+                pos -= step
+            if pos < end:
+                f.truncate(pos)
+
+    def write(self, records):
+        for record in records:
+            self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """
+    Columnar output: a directory of Parquet part files, one row per detection
+    (images without detections get one row with a null class).
+    Each run writes new parts, so earlier parts are never rewritten. A part only
+    gets its footer on close, so parts are rolled every `part_batches` batches
+    and written under a temporary name; a killed run loses at most one part.
+    """
+
+    def __init__(self, path, part_batches=64):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("✗ --format parquet requires pyarrow (pip install pyarrow)")
+        self.pa, self.pq = pa, pq
+        self.path = Path(path)
+        self.part_batches = part_batches
+        self.schema = pa.schema([
+            ('path', pa.string()), ('width', pa.int32()), ('height', pa.int32()),
+            ('class', pa.string()), ('confidence', pa.float32()),
+            ('x1', pa.float32()), ('y1', pa.float32()), ('x2', pa.float32()), ('y2', pa.float32()),
+            ('error', pa.string()),
+        ])
+        self.writer = None
+        self.parts = 0
+
+    def done_paths(self):
+        done = set()
+        # Parts an interrupted run never finished (or that were damaged later) are
+        # set aside, so their images are processed again and the warning shows once
+        unfinished = list(self.path.glob("part-*.parquet.tmp"))
+        for part in sorted(self.path.glob("part-*.parquet")):
+            try:
+                done.update(self.pq.read_table(part, columns=['path']).column('path').to_pylist())
+            except Exception as e:
+                print(f"⚠ Unreadable part {part.name}: {e}")
+                unfinished.append(part)
+        for part in unfinished:
+            broken = part.with_name(part.name.removesuffix(".tmp") + ".broken")
+            os.replace(part, broken)
+            print(f"⚠ Moved unfinished part to {broken.name}; its images will be processed again")
+        return done
+
+    def open(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.prefix = f"part-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+
+    def start_part(self):
+        self.part = self.path / f"{self.prefix}-{self.parts:05d}.parquet"
+        self.tmp = self.part.with_name(self.part.name + ".tmp")
+        self.writer = self.pq.ParquetWriter(self.tmp, self.schema)
+        self.batches = 0
+        self.parts += 1
+
+    def finish_part(self):
+        """Write the footer and publish the part under its final name"""
+        self.writer.close()
+        os.replace(self.tmp, self.part)
+        self.writer = None
+
+    def write(self, records):
+        rows = []
+        for record in records:
+            base = {'path': record['path'], 'width': record.get('width'),
+                    'height': record.get('height'), 'error': record.get('error')}
+            if not record.get('detections'):
+                rows.append(base)
+            for det in record.get('detections', []):
+                x1, y1, x2, y2 = det['bbox']
+                rows.append(dict(base, **{'class': det['class'], 'confidence': det['confidence'],
+                                          'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2}))
+        if self.writer is None:
+            self.start_part()
+        self.writer.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+        self.batches += 1
+        if self.batches >= self.part_batches:
+            self.finish_part()
+
+    def close(self):
+        if self.writer is not None:
+            self.finish_part()
+
+
+def decode_stream(paths, workers, prefetch):
+    """Decode images on a thread pool, keeping at most `prefetch` in flight"""
+    with ThreadPoolExecutor(workers) as executor:
+        pending = deque()
+        for path in paths:
+            pending.append((path, executor.submit(cv2.imread, path, cv2.IMREAD_COLOR)))
+            if len(pending) >= prefetch:
+                path, future = pending.popleft()
+                yield path, future.result()
+        while pending:
+            path, future = pending.popleft()
+            yield path, future.result()
+
+
+def batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def format_eta(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk YOLO detection over many images")
+    parser.add_argument("inputs", nargs="+", help="Files, directories, glob patterns or @filelist.txt")
+    parser.add_argument("--model", default="best.pt", help="YOLO weights")
+    parser.add_argument("--output", default="detections.jsonl", help="Output file (jsonl) or directory (parquet)")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl", help="Output format")
+    parser.add_argument("--conf", type=float, default=0.25, help="Confidence threshold")
+    parser.add_argument("--imgsz", type=int, default=640, help="Inference size")
+    parser.add_argument("--batch", type=int, default=16, help="Images per inference batch")
+    parser.add_argument("--workers", type=int, default=4, help="Decode threads")
+    parser.add_argument("--prefetch", type=int, default=64, help="Decoded images kept ahead of inference")
+    parser.add_argument("--no-count", action="store_true", help="Skip the counting pass (no ETA)")
+    parser.add_argument("--part-batches", type=int, default=64,
+                        help="Batches per Parquet part file (bounds what a killed run loses)")
+    args = parser.parse_args()
+
+    from ultralytics import YOLO
+    model = YOLO(args.model)
+
+    if args.format == "parquet":
+        writer = ParquetWriter(args.output, max(1, args.part_batches))
+    else:
+        writer = JsonlWriter(args.output)
+    done = writer.done_paths()
+    if done:
+        print(f"↻ Resuming: {len(done)} images already processed")
+
+    total = None
+    if not args.no_count:
+        total = sum(1 for path in iter_inputs(args.inputs) if path not in done)
+        print(f"📂 {total} images to process")
+
+    todo = (path for path in iter_inputs(args.inputs) if path not in done)
+    writer.open()
+    start = last_report = time.time()
+    processed = 0
+
+    try:
+        for batch in batched(decode_stream(todo, args.workers, args.prefetch), args.batch):
+            records = [{'path': path, 'error': 'decode failed'} for path, img in batch if img is None]
+            valid = [(path, img) for path, img in batch if img is not None]
+
+            if valid:
+                results = model.predict(source=[img for _, img in valid], conf=args.conf,
+                                        imgsz=args.imgsz, stream=True, verbose=False)
+                for (path, img), r in zip(valid, results):
+                    records.append({
+                        'path': path,
+                        'width': img.shape[1],
+                        'height': img.shape[0],
+                        'detections': [{
+                            'class': r.names[int(box.cls[0])],
+                            'confidence': float(box.conf[0]),
+                            'bbox': box.xyxy[0].tolist()
+                        } for box in r.boxes]
+                    })
+
+            writer.write(records)
+            processed += len(batch)
+
+            now = time.time()
+            if now - last_report >= 2.0:
+                last_report = now
+                rate = processed / (now - start)
+                eta = f" | ETA {format_eta((total - processed) / rate)}" if total and rate > 0 else ""
+                progress = f"{processed}/{total}" if total is not None else f"{processed}"
+                print(f"\r⚡ {progress} images | {rate:.1f} img/s{eta}", end="", flush=True)
+    finally:
+        writer.close()
+
+    elapsed = time.time() - start
+    print(f"\n✓ Detection done on {processed} images in {elapsed:.1f}s "
+          f"({processed / max(elapsed, 1e-9):.1f} img/s) → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
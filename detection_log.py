@@ -0,0 +1,192 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+# --------------------------------
+# DETECTION RECORD & REPLAY
+# --------------------------------
+#
+# Log layout: a 16-byte header (magic + record size) followed by fixed-size
+# little-endian records, one per detection. A frame without detections is
+# stored as a single record with cls == -1 so frame timing is preserved.
+
+MAGIC = b"DETLOG01"
+HEADER_SIZE = 16
+
+RECORD_DTYPE = np.dtype([
+    ('frame', '<u4'),
+    ('cls', '<i2'),
+    ('reserved', '<u2'),
+    ('timestamp', '<f8'),
+    ('x1', '<f4'), ('y1', '<f4'), ('x2', '<f4'), ('y2', '<f4'),
+    ('conf', '<f4'),
+])
+
+
+class DetectionRecorder:
+    def __init__(self, path, flush_every=256):
+        """Append raw per-frame detections to a compact binary log"""
+        self.path = path
+        self.flush_every = flush_every
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC + np.uint32(RECORD_DTYPE.itemsize).tobytes() + bytes(4))
+        self.pending = []
+        self.frames = 0
+
+    def write_frame(self, timestamp, boxes):
+        """Record one frame of (x1, y1, x2, y2, conf, cls) boxes"""
+        records = np.zeros(max(1, len(boxes)), RECORD_DTYPE)
+        records['frame'] = self.frames
+        records['timestamp'] = timestamp
+        if boxes:
+            arr = np.asarray([box[:6] for box in boxes], np.float64)
+            for i, name in enumerate(('x1', 'y1', 'x2', 'y2', 'conf', 'cls')):
+                records[name] = arr[:, i]
+        else:
+            records['cls'] = -1
+        self.pending.append(records)
+        self.frames += 1
+
+        if len(self.pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.file.write(np.concatenate(self.pending).tobytes())
+            self.pending = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def load_log(path):
+    """
+    Memory-map a detection log as a structured array (no copy). A log cut off
+    mid-record (killed recorder) loads up to its last complete record.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+        size = os.fstat(f.fileno()).st_size
+    if len(header) < HEADER_SIZE or header[:8] != MAGIC:
+        raise ValueError(f"{path} is not a detection log")
+    record_size = int(np.frombuffer(header, '<u4', count=1, offset=8)[0])
+    if record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path} has record size {record_size}, expected {RECORD_DTYPE.itemsize}")
+    count = (size - HEADER_SIZE) // RECORD_DTYPE.itemsize
+    if count == 0:
+        return np.zeros(0, RECORD_DTYPE)  # np.memmap can't map an empty range
+    return np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(count,))
+
+
+def iter_frames(records, chunk_size=65536):
+    """
+    Yield (timestamp, boxes) per frame, where boxes are (x1, y1, x2, y2, conf, cls)
+    tuples. Records are converted in chunks so huge logs stay memory-mapped.
+    """
+    start = 0
+    total = len(records)
+    while start < total:
+        end = min(start + chunk_size, total)
+        # Extend the chunk to the end of the frame it cuts through
+        if end < total:
+            last_frame = records['frame'][end - 1]
+            while end < total and records['frame'][end] == last_frame:
+                end += 1
+
+        chunk = records[start:end]
+        frames = chunk['frame']
+        boundaries = np.flatnonzero(frames[1:] != frames[:-1]) + 1
+        timestamps = chunk['timestamp'].tolist()
+        cls = chunk['cls'].tolist()
+        rows = list(zip(chunk['x1'].tolist(), chunk['y1'].tolist(), chunk['x2'].tolist(),
+                        chunk['y2'].tolist(), chunk['conf'].tolist(), cls))
+
+        begin = 0
+        for stop in list(boundaries) + [len(chunk)]:
+            boxes = [] if cls[begin] == -1 else rows[begin:stop]
+            yield timestamps[begin], boxes
+            begin = stop
+        start = end
+
+
+def replay(path, pipeline):
+    """
+    Feed a log through pipeline(timestamp, boxes) as fast as possible.
+    Returns (outputs, frames, elapsed_seconds, recorded_duration_seconds).
+    """
+    records = load_log(path)
+    outputs = []
+    start = time.perf_counter()
+    for timestamp, boxes in iter_frames(records):
+        outputs.append(pipeline(timestamp, boxes))
+    elapsed = time.perf_counter() - start
+
+    duration = float(records['timestamp'][-1] - records['timestamp'][0]) if len(records) else 0.0
+    return outputs, len(outputs), elapsed, duration
+
+
+def jitter(values):
+    """Mean absolute frame-to-frame change of a distance series (lower is smoother)"""
+    values = np.array([v for v in values if v is not None], np.float64)
+    return float(np.mean(np.abs(np.diff(values)))) if len(values) > 1 else 0.0
+
+
+def advanced_pipeline(args):
+    """AdvancedDistanceDetector without a model; outputs the buffered average"""
+    from advanced_distance_detection import AdvancedDistanceDetector
+    detector = AdvancedDistanceDetector(model_path=None)
+    detector.WIDTH_WEIGHT = args.width_weight
+    detector.HEIGHT_WEIGHT = 1.0 - args.width_weight
+    detector.PROCESS_NOISE = args.process_noise
+    detector.MEASUREMENT_NOISE = args.measurement_noise
+    return lambda timestamp, boxes: detector.process_detections(boxes)[1]
+
+
+def compare_pipeline(args):
+    """DistanceComparison without a model; outputs all three methods"""
+    from compare_methods import DistanceComparison
+    comparator = DistanceComparison(model_path=None)
+    comparator.PROCESS_NOISE = args.process_noise
+    comparator.MEASUREMENT_NOISE = args.measurement_noise
+    comparator.kalman_filter = comparator.create_kalman_filter()
+    return lambda timestamp, boxes: comparator.process_detections(boxes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or replay recorded detections")
+    parser.add_argument("command", choices=["info", "replay"])
+    parser.add_argument("log", help="Detection log recorded with --record")
+    parser.add_argument("--pipeline", choices=["advanced", "compare"], default="advanced")
+    parser.add_argument("--process-noise", type=float, default=0.03)
+    parser.add_argument("--measurement-noise", type=float, default=0.1)
+    parser.add_argument("--width-weight", type=float, default=0.6,
+                        help="Width share of the width/height distance blend (advanced only)")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        records = load_log(args.log)
+        frames = int(records['frame'][-1]) + 1 if len(records) else 0
+        detections = int(np.count_nonzero(records['cls'] >= 0))
+        duration = float(records['timestamp'][-1] - records['timestamp'][0]) if len(records) else 0.0
+        print(f"📼 {args.log}: {frames} frames, {detections} detections, {duration:.1f}s recorded")
+    else:
+        if args.pipeline == "advanced":
+            outputs, frames, elapsed, duration = replay(args.log, advanced_pipeline(args))
+            series = {'average': outputs}
+        else:
+            outputs, frames, elapsed, duration = replay(args.log, compare_pipeline(args))
+            series = {method: [o[method] for o in outputs] for method in ('basic', 'kalman', 'buffered')}
+
+        speedup = duration / elapsed if elapsed > 0 else float('inf')
+        print("=" * 60)
+        print(f"▶ Replayed {frames} frames in {elapsed:.3f}s "
+              f"({frames / max(elapsed, 1e-9):.0f} frames/s, {speedup:.0f}x real time)")
+        for name, values in series.items():
+            measured = [v for v in values if v is not None]
+            if measured:
+                print(f"{name.upper():10} | mean {np.mean(measured):.1f}cm | "
+                      f"jitter {jitter(values):.3f}cm/frame | {len(measured)} frames measured")
+        print("=" * 60)
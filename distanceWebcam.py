@@ -1,5 +1,6 @@
 from ultralytics import YOLO
 import cv2
+from keyframe_tracker import KeyframeTracker, boxes_from_results
 
 # -----------------------------
 # PARAMETERS
@@ -7,6 +8,7 @@ import cv2
 KNOWN_WIDTH = 4.0       # The real width of your object in cm
 KNOWN_HEIGHT = 12.0     # The real height of your object in cm
 FOCAL_LENGTH = 700      # STARTING POINT: Calibrate this using Step 1 above!
+KEYFRAME_INTERVAL = 1   # >1: run YOLO every N frames, propagate boxes in between
 
 # Load your trained model
 model = YOLO("best.pt")
@@ -17,18 +19,27 @@ cap = cv2.VideoCapture(0)
 # To make the distance display smoother
 smooth_distance = 0
 
+# Keyframe mode (skips YOLO on frames in between keyframes)
+keyframe_tracker = KeyframeTracker(KEYFRAME_INTERVAL) if KEYFRAME_INTERVAL > 1 else None
+
+def detect_boxes(frame):
+    return boxes_from_results(model(frame, conf=0.5))
+
 while True:
     ret, frame = cap.read()
     if not ret:
         break
 
-    # Run YOLO11 inference
-    results = model(frame, conf=0.5)
+    # Run YOLO11 inference (or propagate boxes between keyframes)
+    if keyframe_tracker:
+        boxes = keyframe_tracker.update(frame, detect_boxes)
+    else:
+        boxes = detect_boxes(frame)
 
-    for box in results[0].boxes:
+    for box in boxes:
         # Get coordinates
-        x1, y1, x2, y2 = map(int, box.xyxy[0])
-        conf = box.conf[0]
+        x1, y1, x2, y2 = map(int, box[:4])
+        conf = box[4]
         
         # Calculate width in pixels
         pixel_width = x2 - x1
@@ -61,4 +72,7 @@ while True:
         break
 
 cap.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+cv2.destroyAllWindows()
+
+if keyframe_tracker:
+    keyframe_tracker.print_report()
\ No newline at end of file
@@ -0,0 +1,135 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+# --------------------------------
+# PER-STAGE FRAME PROFILER
+# --------------------------------
+
+class FrameProfiler:
+    def __init__(self, trace_path=None, window=300, log_every=0):
+        """
+        Low-overhead stage timers for run loops. Call begin_frame(), then
+        mark(stage) after each stage (time since the previous mark), then end_frame():
+        1. Rolling p50/p95/p99 per stage over the last `window` frames
+        2. On-screen overlay or a log line every `log_every` frames (headless)
+        3. Optional Chrome/Perfetto trace (open in chrome://tracing or ui.perfetto.dev)
+        """
+        self.window = window
+        self.log_every = log_every
+        self.samples = {}
+        self.frame_count = 0
+        self.frame_start = None
+        self.last_mark = None
+        self.overlay_stats = {}
+
+        self.pid = os.getpid()
+        self.tid = threading.get_ident()
+        self.origin_ns = time.perf_counter_ns()
+        self.trace_path = trace_path
+        self.trace_file = None
+        if trace_path:
+            # Streamed JSON array: events are written as they happen
+            self.trace_file = open(trace_path, 'w')
+            self.trace_file.write('[\n')
+
+    def _record(self, name, start_ns, end_ns, args=None):
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.window)
+        samples.append((end_ns - start_ns) / 1e6)
+
+        if self.trace_file:
+            event = {
+                'name': name, 'ph': 'X', 'pid': self.pid, 'tid': self.tid,
+                'ts': (start_ns - self.origin_ns) / 1000, 'dur': (end_ns - start_ns) / 1000,
+            }
+            if args:
+                event['args'] = args
+            self.trace_file.write(json.dumps(event) + ',\n')
+
+    def begin_frame(self):
+        self.frame_start = self.last_mark = time.perf_counter_ns()
+
+    def mark(self, name):
+        """Record the time since the previous mark as stage `name`"""
+        if self.last_mark is None:
+            return
+        now = time.perf_counter_ns()
+        self._record(name, self.last_mark, now)
+        self.last_mark = now
+
+    def end_frame(self):
+        """Close the current frame and emit a log line if due"""
+        if self.frame_start is None:
+            return
+        self._record('frame', self.frame_start, time.perf_counter_ns(), {'frame': self.frame_count})
+        self.frame_start = self.last_mark = None
+        self.frame_count += 1
+
+        if self.log_every and self.frame_count % self.log_every == 0:
+            print(self.summary_line())
+
+    def percentiles(self):
+        """{stage: (p50, p95, p99)} in milliseconds over the rolling window"""
+        return {
+            name: tuple(np.percentile(samples, (50, 95, 99)))
+            for name, samples in self.samples.items() if samples
+        }
+
+    def summary_line(self):
+        stats = self.percentiles()
+        parts = [f"{name} {p50:.1f}/{p95:.1f}/{p99:.1f}" for name, (p50, p95, p99) in stats.items()]
+        return f"⏱ frame {self.frame_count} | p50/p95/p99 ms | " + " | ".join(parts)
+
+    def draw_overlay(self, frame, origin=None):
+        """Draw a per-stage percentile table onto the frame (top-right by default)"""
+        # Percentiles are refreshed every 10 frames to keep the overlay cheap
+        if not self.overlay_stats or self.frame_count % 10 == 0:
+            self.overlay_stats = self.percentiles()
+        stats = self.overlay_stats
+        if not stats:
+            return
+        x, y = origin or (frame.shape[1] - 330, 20)
+        cv2.putText(frame, "stage      p50   p95   p99 ms", (x, y),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 255), 1)
+        for i, (name, (p50, p95, p99)) in enumerate(stats.items(), start=1):
+            cv2.putText(frame, f"{name[:10]:10} {p50:5.1f} {p95:5.1f} {p99:5.1f}", (x, y + i * 18),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 255, 255), 1)
+
+    def close(self):
+        """Finish the trace file and print a final summary"""
+        if self.trace_file:
+            self.trace_file.write(json.dumps({
+                'name': 'process_name', 'ph': 'M', 'pid': self.pid,
+                'args': {'name': 'run loop'}
+            }) + '\n]\n')
+            self.trace_file.close()
+            self.trace_file = None
+            print(f"✓ Trace written to {self.trace_path}")
+        if self.samples:
+            print(self.summary_line())
+
+
+class NullProfiler:
+    """Drop-in profiler that does nothing, used when --profile is off"""
+
+    def begin_frame(self):
+        pass
+
+    def mark(self, name):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def draw_overlay(self, frame, origin=None):
+        pass
+
+    def close(self):
+        pass
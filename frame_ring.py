@@ -0,0 +1,550 @@
+import argparse
+import multiprocessing as mp
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import cv2
+import numpy as np
+
+# --------------------------------
+# SHARED-MEMORY FRAME RING
+# --------------------------------
+#
+# One writer (the capture process) fills preallocated frame slots in a named
+# shared-memory block; any number of reader processes map the same block and
+# get frames as NumPy views, so no frame is pickled or copied between processes.
+#
+# Layout (int64 words, then frames aligned to 64 bytes):
+#   header[9]             magic, slots, height, width, channels, latest seq, closed, max readers, lossless
+#   reader_pos[readers]   last seq each reader is done with (-1 = free reader slot)
+#   slot_seq[slots]       seq stored in each slot (-1 while being written)
+#   slot_ts[slots]        capture timestamp (float64) of each slot
+#   frames[slots]         height x width x channels uint8
+#
+# Sequence numbers start at 1. A reader checks slot_seq before and after using
+# a view (seqlock); if the writer lapped the ring meanwhile, the frame is discarded.
+
+MAGIC = int.from_bytes(b"FRMRING1", "little")
+HEADER_WORDS = 9
+H_MAGIC, H_SLOTS, H_HEIGHT, H_WIDTH, H_CHANNELS, H_LATEST, H_CLOSED, H_READERS, H_LOSSLESS = range(HEADER_WORDS)
+
+
+def _reader_token(ring_name, reader_id):
+    """Name of the block a reader creates (O_EXCL) to own its reader slot"""
+    return f"{ring_name}_r{reader_id}"
+
+
+def _attach_shm(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    # Python < 3.13 registers attached blocks with the resource tracker, which
+    # would unlink the writer's ring when this process exits
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class FrameRing:
+    def __init__(self, shm, owner=False):
+        """Map a ring block; use FrameRing.create() or FrameRing.attach()"""
+        self.shm = shm
+        self.owner = owner
+        self.name = shm.name
+
+        self.header = np.ndarray((HEADER_WORDS,), np.int64, shm.buf)
+        if self.header[H_MAGIC] != MAGIC:
+            raise ValueError(f"Shared memory block {shm.name} is not a frame ring")
+        self.slots = int(self.header[H_SLOTS])
+        self.shape = tuple(int(v) for v in self.header[H_HEIGHT:H_CHANNELS + 1])
+        readers = int(self.header[H_READERS])
+        self.lossless = bool(self.header[H_LOSSLESS])
+
+        offset = HEADER_WORDS * 8
+        self.reader_pos = np.ndarray((readers,), np.int64, shm.buf, offset)
+        offset += readers * 8
+        self.slot_seq = np.ndarray((self.slots,), np.int64, shm.buf, offset)
+        offset += self.slots * 8
+        self.slot_ts = np.ndarray((self.slots,), np.float64, shm.buf, offset)
+        offset += self.slots * 8
+        self.frames = np.ndarray((self.slots,) + self.shape, np.uint8, shm.buf, self._align(offset))
+
+        self.next_seq = int(self.header[H_LATEST]) + 1
+
+    @staticmethod
+    def _align(offset):
+        return (offset + 63) // 64 * 64
+
+    @classmethod
+    def create(cls, name, shape, slots=8, max_readers=4, lossless=False):
+        """
+        Allocate a ring for frames of `shape` (h, w[, c]); the creator unlinks it on close().
+        A lossless ring makes the writer wait for slow readers instead of overwriting.
+        """
+        height, width = shape[:2]
+        channels = shape[2] if len(shape) > 2 else 1
+        offset = cls._align((HEADER_WORDS + max_readers + 2 * slots) * 8)
+        size = offset + slots * height * width * channels
+
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((HEADER_WORDS,), np.int64, shm.buf)
+        header[:] = (MAGIC, slots, height, width, channels, 0, 0, max_readers, int(lossless))
+        del header
+
+        ring = cls(shm, owner=True)
+        ring.reader_pos[:] = -1
+        ring.slot_seq[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name, timeout=10.0):
+        """Map an existing ring, waiting up to `timeout` s for the writer to create it"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return cls(_attach_shm(name))
+            except FileNotFoundError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+
+    # ---- writer ----
+
+    def claim(self, timeout=None, poll=0.0002):
+        """
+        Reserve the next slot and return (seq, writable view), e.g. for
+        cap.read(view). On a lossless ring, first wait until every registered
+        reader is done with the frame the slot still holds.
+        """
+        seq = self.next_seq
+        if self.lossless:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while True:
+                active = self.reader_pos[self.reader_pos >= 0]
+                if not len(active) or active.min() >= seq - self.slots:
+                    break
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError("Frame ring readers are not keeping up")
+                time.sleep(poll)
+
+        slot = seq % self.slots
+        self.slot_seq[slot] = -1
+        return seq, self.frames[slot]
+
+    def publish(self, seq, timestamp=None):
+        """Make a claimed slot visible to readers"""
+        slot = seq % self.slots
+        self.slot_ts[slot] = time.time() if timestamp is None else timestamp
+        self.slot_seq[slot] = seq
+        self.header[H_LATEST] = seq
+        self.next_seq = seq + 1
+
+    def write(self, frame, timestamp=None):
+        """Copy a frame into the next slot and publish it"""
+        seq, view = self.claim()
+        np.copyto(view, frame.reshape(view.shape))
+        self.publish(seq, timestamp)
+        return seq
+
+    def close_writer(self):
+        """Tell readers no more frames will come"""
+        self.header[H_CLOSED] = 1
+
+    def evict_readers(self, force=False):
+        """
+        Free the slots of readers that died without close(): their slot token
+        is gone (the resource tracker unlinks it when the process exits).
+        With force=True, also drop the readers holding back a lossless writer.
+        Returns the evicted reader ids.
+        """
+        evicted = []
+        active = np.flatnonzero(self.reader_pos >= 0)
+        slowest = self.reader_pos[active].min() if len(active) else None
+        for reader_id in active:
+            try:
+                _attach_shm(_reader_token(self.name, reader_id)).close()
+                alive = True
+            except FileNotFoundError:
+                alive = False
+            if not alive or (force and self.reader_pos[reader_id] == slowest):
+                self.reader_pos[reader_id] = -1
+                evicted.append(int(reader_id))
+        return evicted
+
+    def wait_for_reader(self, poll=0.05):
+        """Block until at least one reader has registered"""
+        while not (self.reader_pos >= 0).any():
+            time.sleep(poll)
+
+    # ---- readers ----
+
+    def latest(self):
+        return int(self.header[H_LATEST])
+
+    def closed(self):
+        return bool(self.header[H_CLOSED])
+
+    def get(self, seq):
+        """Read-only view of frame `seq`, or None if its slot was reused"""
+        slot = seq % self.slots
+        if seq <= 0 or self.slot_seq[slot] != seq:
+            return None
+        view = self.frames[slot].view()
+        view.flags.writeable = False
+        return view
+
+    def valid(self, seq):
+        """True while frame `seq` hasn't been overwritten (check after using a view)"""
+        return self.slot_seq[seq % self.slots] == seq
+
+    def timestamp(self, seq):
+        return float(self.slot_ts[seq % self.slots])
+
+    def close(self):
+        # Views into the block must be gone before it can be unmapped
+        self.header = self.reader_pos = self.slot_seq = self.slot_ts = self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class RingReader:
+    def __init__(self, ring, reader_id=None, ordered=None, poll=0.0002):
+        """
+        Read frames from a ring:
+        - latest mode: always the newest frame; skipped ones are counted
+        - ordered mode: every frame in sequence (default on lossless rings)
+        Calling next() releases the previous frame to a lossless writer.
+        """
+        self.ring = ring
+        self.ordered = ring.lossless if ordered is None else ordered
+        self.poll = poll
+        self.dropped = 0
+
+        # Slots are claimed by creating a token block, which is atomic across
+        # processes; readers given an explicit reader_id coordinate themselves
+        self.token = None
+        if reader_id is None:
+            for candidate in range(len(ring.reader_pos)):
+                try:
+                    self.token = shared_memory.SharedMemory(
+                        name=_reader_token(ring.name, candidate), create=True, size=1)
+                except FileExistsError:
+                    continue
+                reader_id = candidate
+                ring.reader_pos[reader_id] = -1  # Left over by a reader that crashed
+                break
+            else:
+                raise RuntimeError(f"Frame ring {ring.name} has no free reader slot")
+        self.reader_id = reader_id
+
+        if ring.reader_pos[reader_id] < 0:
+            ring.reader_pos[reader_id] = ring.latest()
+        self.last = int(ring.reader_pos[reader_id])
+
+    def next(self, timeout=None):
+        """(seq, read-only view) of the next frame, or (None, None) on timeout or writer close"""
+        ring = self.ring
+        ring.reader_pos[self.reader_id] = self.last
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            latest = ring.latest()
+            if latest > self.last:
+                # Frames older than one lap have been overwritten already
+                seq = max(self.last + 1, latest - ring.slots + 1) if self.ordered else latest
+                view = ring.get(seq)
+                if view is not None:
+                    self.dropped += seq - self.last - 1
+                    self.last = seq
+                    return seq, view
+                continue
+
+            if ring.closed():
+                return None, None
+            if deadline is not None and time.monotonic() > deadline:
+                return None, None
+            time.sleep(self.poll)
+
+    def close(self):
+        if self.ring.reader_pos is not None:
+            self.ring.reader_pos[self.reader_id] = -1
+        if self.token:
+            self.token.close()
+            self.token.unlink()
+            self.token = None
+
+
+class RingCapture:
+    def __init__(self, name, timeout=5.0):
+        """
+        cv2.VideoCapture stand-in over a frame ring, so run loops accept
+        --source shm:NAME. The run loops draw on their frames, so each frame is
+        copied once into a reused local buffer (and re-read if the writer lapped it).
+        """
+        self.ring = FrameRing.attach(name)
+        self.reader = RingReader(self.ring)
+        self.timeout = timeout
+        self.buffer = np.empty(self.ring.shape, np.uint8)
+
+    def read(self, image=None):
+        """Like cv2.VideoCapture.read(); the frame goes into `image` if given"""
+        out = self.buffer if image is None else image
+        while True:
+            seq, view = self.reader.next(self.timeout)
+            if seq is None:
+                return False, None
+            np.copyto(out, view)
+            if self.ring.valid(seq):
+                return True, out
+
+    def isOpened(self):
+        return self.ring is not None
+
+    def set(self, prop, value):
+        return False  # Resolution and FPS are set by the capture process
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.ring.shape[1])
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.ring.shape[0])
+        return 0.0
+
+    def release(self):
+        if self.ring:
+            self.reader.close()
+            self.ring.close()
+            self.ring = None
+
+
+def open_capture(source):
+    """cv2.VideoCapture for camera indexes and files, RingCapture for 'shm:NAME'"""
+    if isinstance(source, str) and source.startswith('shm:'):
+        return RingCapture(source[4:])
+    return cv2.VideoCapture(source)
+
+
+# --------------------------------
+# CAPTURE PROCESS
+# --------------------------------
+
+def claim_evicting(ring, reader_timeout=30.0, poll=1.0):
+    """
+    ring.claim() for a capture loop: dead readers are evicted every `poll` s,
+    and readers that hold a lossless writer back for `reader_timeout` s are dropped
+    """
+    waited = 0.0
+    while True:
+        try:
+            return ring.claim(timeout=poll)
+        except TimeoutError:
+            waited += poll
+            force = waited >= reader_timeout
+            evicted = ring.evict_readers(force=force)
+            if evicted:
+                reason = "stalled" if force else "gone"
+                print(f"⚠ Evicted {reason} reader(s) {evicted} from shm:{ring.name}")
+                waited = 0.0
+
+
+def capture_to_ring(source, name, slots=8, max_readers=4, lossless=None, width=1280, height=720,
+                    reader_timeout=30.0):
+    """Decode frames straight into ring slots until the source ends (or Ctrl+C)"""
+    cap = cv2.VideoCapture(source)
+    is_file = isinstance(source, str)
+    if not is_file:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        cap.set(cv2.CAP_PROP_FPS, 30)
+    # Files are read losslessly by default; cameras never wait for slow readers
+    lossless = is_file if lossless is None else lossless
+
+    ret, frame = cap.read()
+    if not ret:
+        raise RuntimeError(f"Could not read from {source}")
+    ring = FrameRing.create(name, frame.shape, slots, max_readers, lossless)
+    print(f"🎞 Capturing {source} into shm:{name} ({frame.shape[1]}x{frame.shape[0]}, {slots} slots"
+          f"{', lossless' if lossless else ''})")
+    if lossless:
+        print("   Waiting for a reader...")
+        ring.wait_for_reader()
+    seq, slot = claim_evicting(ring, reader_timeout)
+    np.copyto(slot, frame)
+    ring.publish(seq)
+
+    frames = 1
+    start = time.time()
+    try:
+        while True:
+            seq, slot = claim_evicting(ring, reader_timeout)
+            ret, out = cap.read(slot)
+            if not ret:
+                break
+            if out is not slot:
+                np.copyto(slot, out)
+            ring.publish(seq)
+            frames += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.close_writer()
+        elapsed = time.time() - start
+        print(f"✓ Captured {frames} frames ({frames / max(elapsed, 1e-9):.1f} FPS)")
+        # Give readers a moment to drain before the block is unlinked
+        time.sleep(0.5)
+        cap.release()
+        ring.close()
+
+
+# --------------------------------
+# THROUGHPUT COMPARISON
+# --------------------------------
+
+def _touch(frame):
+    """Stand-in for inference: read a sparse grid of pixels"""
+    return int(frame[::32, ::32].sum())
+
+
+def _queue_producer(queues, frames, shape):
+    frame = np.zeros(shape, np.uint8)
+    for i in range(frames):
+        frame[0, :8, 0] = i % 256
+        timestamp = time.time()
+        for q in queues:
+            q.put((i, timestamp, frame))
+    for q in queues:
+        q.put(None)
+
+
+def _queue_consumer(q, ready, results):
+    ready.set()
+    latencies = []
+    while True:
+        item = q.get()
+        if item is None:
+            break
+        i, timestamp, frame = item
+        _touch(frame)
+        latencies.append(time.time() - timestamp)
+    results.put({'frames': len(latencies), 'latencies': latencies, 'dropped': 0})
+
+
+def _ring_producer(name, frames, shape):
+    ring = FrameRing.attach(name)
+    frame = np.zeros(shape, np.uint8)
+    for i in range(frames):
+        frame[0, :8, 0] = i % 256
+        ring.write(frame)
+    ring.close_writer()
+    ring.close()
+
+
+def _ring_consumer(name, reader_id, ready, results):
+    ring = FrameRing.attach(name)
+    reader = RingReader(ring, reader_id)
+    ready.set()
+    latencies = []
+    while True:
+        seq, view = reader.next()
+        if seq is None:
+            break
+        _touch(view)
+        latencies.append(time.time() - ring.timestamp(seq))
+    dropped = reader.dropped
+    reader.close()
+    ring.close()
+    results.put({'frames': len(latencies), 'latencies': latencies, 'dropped': dropped})
+
+
+def benchmark(mode, frames, shape, readers, slots):
+    """Producer process -> `readers` consumer processes; returns throughput and latency"""
+    ctx = mp.get_context()
+    results = ctx.Queue()
+    ready = [ctx.Event() for _ in range(readers)]
+    ring = None
+
+    if mode == 'queue':
+        queues = [ctx.Queue(maxsize=slots) for _ in range(readers)]
+        consumers = [ctx.Process(target=_queue_consumer, args=(queues[i], ready[i], results))
+                     for i in range(readers)]
+        producer = ctx.Process(target=_queue_producer, args=(queues, frames, shape))
+    else:
+        ring = FrameRing.create(f"ringbench_{time.time_ns()}", shape, slots, readers, lossless=True)
+        # Register readers up front so the producer can't lap them at start
+        ring.reader_pos[:] = 0
+        consumers = [ctx.Process(target=_ring_consumer, args=(ring.name, i, ready[i], results))
+                     for i in range(readers)]
+        producer = ctx.Process(target=_ring_producer, args=(ring.name, frames, shape))
+
+    for consumer in consumers:
+        consumer.start()
+    for event in ready:
+        event.wait()
+
+    start = time.perf_counter()
+    producer.start()
+    stats = [results.get() for _ in consumers]
+    elapsed = time.perf_counter() - start
+    producer.join()
+    for consumer in consumers:
+        consumer.join()
+    if ring:
+        ring.close()
+
+    latencies = np.concatenate([s['latencies'] for s in stats]) * 1000
+    delivered = sum(s['frames'] for s in stats)
+    return {
+        'mode': mode,
+        'fps': frames / elapsed,
+        'mb_per_s': delivered * int(np.prod(shape)) / elapsed / 2 ** 20,
+        'latency_ms': (float(np.mean(latencies)), float(np.percentile(latencies, 95))),
+        'dropped': sum(s['dropped'] for s in stats),
+    }
+
+
+def parse_size(size):
+    width, height = (int(v) for v in size.lower().split('x'))
+    return (height, width, 3)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared-memory frame ring between capture and inference processes")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    capture = sub.add_parser("capture", help="Capture a camera or video file into a ring")
+    capture.add_argument("--source", default="0", help="Camera index or video file")
+    capture.add_argument("--name", default="cam0", help="Ring name (readers use --source shm:NAME)")
+    capture.add_argument("--slots", type=int, default=8)
+    capture.add_argument("--readers", type=int, default=4, help="Maximum reader processes")
+    capture.add_argument("--lossless", action="store_true", default=None,
+                         help="Wait for slow readers instead of overwriting (default for files)")
+    capture.add_argument("--reader-timeout", type=float, default=30.0,
+                         help="Drop a reader that holds a lossless ring back this many seconds")
+
+    bench = sub.add_parser("bench", help="Compare ring and multiprocessing.Queue hand-off")
+    bench.add_argument("--frames", type=int, default=1000)
+    bench.add_argument("--size", default="1920x1080", help="Frame size WIDTHxHEIGHT")
+    bench.add_argument("--readers", type=int, default=1, help="Consumer processes (each gets every frame)")
+    bench.add_argument("--slots", type=int, default=8, help="Ring slots / queue capacity")
+    args = parser.parse_args()
+
+    if args.command == "capture":
+        source = int(args.source) if args.source.isdigit() else args.source
+        capture_to_ring(source, args.name, args.slots, args.readers, args.lossless,
+                        reader_timeout=args.reader_timeout)
+    else:
+        shape = parse_size(args.size)
+        print(f"📦 {args.frames} frames of {shape[1]}x{shape[0]} to {args.readers} reader(s)")
+        rows = [benchmark(mode, args.frames, shape, args.readers, args.slots) for mode in ('queue', 'ring')]
+        print("=" * 60)
+        print(f"{'mode':6} | {'frames/s':>9} | {'MB/s':>8} | {'latency mean/p95 ms':>20} | dropped")
+        for r in rows:
+            mean, p95 = r['latency_ms']
+            print(f"{r['mode']:6} | {r['fps']:9.1f} | {r['mb_per_s']:8.0f} | {mean:9.2f} / {p95:8.2f} | {r['dropped']}")
+        print(f"Ring speedup: {rows[1]['fps'] / rows[0]['fps']:.1f}x")
+        print("=" * 60)
@@ -6,6 +6,9 @@ import './App.css';
 
 const API_URL = 'http://localhost:5000/api';
 
+// Lets the server reuse results for unchanged webcam frames
+const SESSION_ID = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+
 function App() {
   const [activeTab, setActiveTab] = useState('upload');
   const [selectedFile, setSelectedFile] = useState(null);
@@ -65,10 +68,13 @@ function App() {
 
     try {
       const response = await axios.post(`${API_URL}/detect-webcam`, {
-        image: imageSrc
+        image: imageSrc,
+        session_id: SESSION_ID
       });
 
-      setResultImage(response.data.image);
+      if (response.data.image) {
+        setResultImage(response.data.image);
+      }
       setDetections(response.data.detections);
     } catch (err) {
       setError(err.response?.data?.error || 'Detection failed');
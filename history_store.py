@@ -0,0 +1,148 @@
+import queue
+import sqlite3
+import threading
+import time
+
+# --------------------------------
+# DETECTION HISTORY STORE
+# --------------------------------
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    source TEXT NOT NULL,
+    class TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    x1 REAL, y1 REAL, x2 REAL, y2 REAL,
+    distance REAL
+);
+CREATE INDEX IF NOT EXISTS idx_detections_ts ON detections (ts);
+CREATE INDEX IF NOT EXISTS idx_detections_class_ts ON detections (class, ts);
+"""
+
+COLUMNS = ('id', 'ts', 'source', 'class', 'confidence', 'x1', 'y1', 'x2', 'y2', 'distance')
+
+_SENTINEL = object()
+
+
+class DetectionHistory:
+    def __init__(self, db_path, batch_size=500, flush_interval=0.5, max_pending=100000):
+        """
+        Append-only detection log in SQLite (WAL mode):
+        1. Requests only enqueue rows; a background thread writes them in batches
+        2. Rows are dropped (and counted) rather than blocking when the queue is full
+        3. Queries use keyset pagination so deep pages stay fast on large tables
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.local = threading.local()
+        self.written = 0
+        self.dropped = 0
+
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.close()
+
+        self.writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self.writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self):
+        """One read connection per request thread"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = self._connect()
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    def record(self, source, detections, ts=None):
+        """Queue detections (dicts with class, confidence, bbox and optional distance_cm)"""
+        ts = time.time() if ts is None else ts
+        for det in detections:
+            x1, y1, x2, y2 = det['bbox']
+            row = (ts, source, det['class'], det['confidence'], x1, y1, x2, y2, det.get('distance_cm'))
+            try:
+                self.pending.put_nowait(row)
+            except queue.Full:
+                self.dropped += 1
+
+    def _write_loop(self):
+        conn = self._connect()
+        running = True
+        while running:
+            item = self.pending.get()
+            if item is _SENTINEL:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+
+            # Gather more rows until the batch is full or the flush interval passes
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self.pending.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _SENTINEL:
+                    running = False
+                    break
+                batch.append(item)
+
+            with conn:
+                conn.executemany(
+                    "INSERT INTO detections (ts, source, class, confidence, x1, y1, x2, y2, distance) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch
+                )
+            self.written += len(batch)
+        conn.close()
+
+    def close(self):
+        """Flush queued rows and stop the writer"""
+        self.pending.put(_SENTINEL)
+        self.writer.join()
+
+    def query(self, start=None, end=None, cls=None, limit=100, cursor=None):
+        """
+        Newest-first page of detections filtered by time range and class.
+        `cursor` is the `next_cursor` of the previous page ("<ts>:<id>").
+        """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        where, params = [], []
+        if cls:
+            where.append("class = ?")
+            params.append(cls)
+        if start is not None:
+            where.append("ts >= ?")
+            params.append(start)
+        if end is not None:
+            where.append("ts < ?")
+            params.append(end)
+        if cursor:
+            cursor_ts, cursor_id = cursor.split(':')
+            where.append("(ts, id) < (?, ?)")
+            params.extend([float(cursor_ts), int(cursor_id)])
+
+        sql = "SELECT " + ", ".join(COLUMNS) + " FROM detections"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts DESC, id DESC LIMIT ?"
+        params.append(limit)
+
+        rows = [dict(zip(COLUMNS, row)) for row in self._reader().execute(sql, params)]
+        next_cursor = f"{rows[-1]['ts']!r}:{rows[-1]['id']}" if len(rows) == limit else None
+        return rows, next_cursor
+
+    def snapshot(self):
+        """Writer statistics for the health endpoint"""
+        return {'pending': self.pending.qsize(), 'written': self.written, 'dropped': self.dropped}
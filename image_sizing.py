@@ -0,0 +1,107 @@
+import math
+
+import cv2
+import numpy as np
+
+# --------------------------------
+# RESOLUTION-AWARE DECODING
+# --------------------------------
+#
+# The model letterboxes everything to its inference size, so decoding a 12 MP
+# photo at full resolution only to shrink it again wastes time and memory.
+# JPEGs are decoded at 1/2, 1/4 or 1/8 scale straight from the DCT (OpenCV's
+# IMREAD_REDUCED_COLOR_*), keeping the long side at or above the target, and
+# boxes are mapped back to the original image coordinates.
+
+REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _jpeg_dimensions(data):
+    """Walk JPEG segments up to the start-of-frame marker"""
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # Fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # Markers without a length
+            i += 2
+            continue
+        # SOF0-SOF15, except DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height = int.from_bytes(data[i + 5:i + 7], 'big')
+            width = int.from_bytes(data[i + 7:i + 9], 'big')
+            return width, height
+        i += 2 + int.from_bytes(data[i + 2:i + 4], 'big')
+    return None
+
+
+def image_dimensions(data):
+    """(width, height) of a JPEG or PNG read from its header, or None for other formats"""
+    if data[:2] == b"\xff\xd8":
+        return _jpeg_dimensions(data)
+    if data[:8] == PNG_SIGNATURE and data[12:16] == b"IHDR":
+        return int.from_bytes(data[16:20], 'big'), int.from_bytes(data[20:24], 'big')
+    return None
+
+
+def decode_factor(width, height, target):
+    """Largest reduced-decode factor that keeps the long side at or above `target`"""
+    long_side = max(width, height)
+    factor = 1
+    for candidate in (2, 4, 8):
+        if long_side / candidate >= target:
+            factor = candidate
+    return factor
+
+
+def inference_size(image, target, stride=32):
+    """Model input size: `target`, or the image's long side (rounded up to the stride) if smaller"""
+    long_side = max(image.shape[:2])
+    return min(target, math.ceil(long_side / stride) * stride)
+
+
+def decode_for_inference(data, target):
+    """
+    Decode image bytes at the smallest size that still covers `target`.
+    Returns (image, (scale_x, scale_y), (original_width, original_height));
+    image is None if the data can't be decoded.
+    """
+    dims = image_dimensions(data)
+    factor = decode_factor(*dims, target) if dims else 1
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), REDUCED_FLAGS[factor])
+    if image is None:
+        return None, (1.0, 1.0), dims
+
+    height, width = image.shape[:2]
+    if dims:
+        original_width, original_height = dims
+        # EXIF orientation is applied on decode, the header has the stored axes
+        if (width > height) != (original_width > original_height):
+            original_width, original_height = original_height, original_width
+    else:
+        original_width, original_height = width, height
+        # Other formats were decoded in full; shrink so later stages scale with the target
+        if factor == 1 and max(width, height) >= 2 * target:
+            shrink = target / max(width, height)
+            image = cv2.resize(image, (round(width * shrink), round(height * shrink)),
+                               interpolation=cv2.INTER_AREA)
+            height, width = image.shape[:2]
+
+    return image, (original_width / width, original_height / height), (original_width, original_height)
+
+
+def scale_box(box, scale):
+    """Map an (x1, y1, x2, y2) box from the decoded image back to original coordinates"""
+    x1, y1, x2, y2 = box[:4]
+    sx, sy = scale
+    return [x1 * sx, y1 * sy, x2 * sx, y2 * sy]
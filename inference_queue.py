@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+# --------------------------------
+# BOUNDED INFERENCE QUEUE
+# --------------------------------
+
+class QueueFullError(Exception):
+    """Raised when a priority class has no room left"""
+
+    def __init__(self, retry_after):
+        super().__init__("Inference queue is full")
+        self.retry_after = retry_after
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a request's deadline passed before inference started"""
+
+
+class InferenceQueue:
+    def __init__(self, run_fn, limits=None):
+        """
+        Single worker that owns the model, fed by bounded per-class queues:
+        1. Requests are rejected immediately when their class is full
+        2. Higher-priority classes are always served first
+        3. Requests whose deadline has passed are dropped, not run
+        """
+        self.run_fn = run_fn
+        # Ordered by priority: first class wins
+        self.limits = limits or {'webcam': 4, 'upload': 16}
+        self.queues = {name: deque() for name in self.limits}
+
+        self.condition = threading.Condition()
+        self.stats = {name: {'completed': 0, 'rejected': 0, 'expired': 0} for name in self.limits}
+        self.avg_service_time = 0.1
+
+        self.worker = threading.Thread(target=self._work, name="inference-worker", daemon=True)
+        self.worker.start()
+
+    def depth(self):
+        """Total number of queued requests"""
+        return sum(len(q) for q in self.queues.values())
+
+    def is_full(self, priority):
+        """True if a request of this class would be rejected right now"""
+        return len(self.queues[priority]) >= self.limits[priority]
+
+    def reject(self, priority):
+        """Count a request shed before submit(); returns its Retry-After"""
+        with self.condition:
+            self.stats[priority]['rejected'] += 1
+            return self.retry_after()
+
+    def retry_after(self):
+        """Seconds a rejected client should wait before retrying"""
+        return max(1, int(self.depth() * self.avg_service_time + 0.999))
+
+    def submit(self, priority, payload, timeout):
+        """Queue payload for inference and block until its result is ready"""
+        deadline = time.monotonic() + timeout
+        future = Future()
+
+        with self.condition:
+            if self.is_full(priority):
+                self.stats[priority]['rejected'] += 1
+                raise QueueFullError(self.retry_after())
+            item = (deadline, payload, future)
+            self.queues[priority].append(item)
+            self.condition.notify()
+
+        # Higher classes can starve this one, so don't rely on the worker to expire it
+        try:
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeout:
+            with self.condition:
+                try:
+                    self.queues[priority].remove(item)
+                except ValueError:
+                    item = None  # Already picked up by the worker
+                else:
+                    self.stats[priority]['expired'] += 1
+            if item is not None:
+                raise DeadlineExceededError("Request deadline exceeded")
+        # Inference started just before the deadline; it finishes in one service time
+        return future.result()
+
+    def _next_item(self):
+        """Pop the oldest request of the highest non-empty priority class"""
+        with self.condition:
+            while not self.depth():
+                self.condition.wait()
+            for name, q in self.queues.items():
+                if q:
+                    return name, q.popleft()
+
+    def _work(self):
+        while True:
+            priority, (deadline, payload, future) = self._next_item()
+
+            if time.monotonic() > deadline:
+                self.stats[priority]['expired'] += 1
+                future.set_exception(DeadlineExceededError("Request deadline exceeded"))
+                continue
+
+            start = time.monotonic()
+            try:
+                future.set_result(self.run_fn(payload))
+            except Exception as e:
+                future.set_exception(e)
+            elapsed = time.monotonic() - start
+
+            # Exponential moving average used for Retry-After estimates
+            self.avg_service_time = self.avg_service_time * 0.9 + elapsed * 0.1
+            self.stats[priority]['completed'] += 1
+
+    def snapshot(self):
+        """Queue depth and shed counters for the health endpoint"""
+        with self.condition:
+            return {
+                'depth': {name: len(q) for name, q in self.queues.items()},
+                'limits': dict(self.limits),
+                'avg_inference_ms': round(self.avg_service_time * 1000, 1),
+                'classes': {name: dict(s) for name, s in self.stats.items()},
+            }
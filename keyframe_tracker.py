@@ -0,0 +1,192 @@
+import cv2
+import numpy as np
+
+# --------------------------------
+# KEYFRAME DETECTION + BOX PROPAGATION
+# --------------------------------
+
+def boxes_from_results(results):
+    """Convert YOLO results into a list of (x1, y1, x2, y2, conf, cls) tuples"""
+    boxes = []
+    for box in results[0].boxes:
+        x1, y1, x2, y2 = box.xyxy[0].tolist()
+        boxes.append((x1, y1, x2, y2, float(box.conf[0]), int(box.cls[0])))
+    return boxes
+
+
+def box_iou(a, b):
+    """Intersection over union of two (x1, y1, x2, y2, ...) boxes"""
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class KeyframeTracker:
+    def __init__(self, interval=5, min_confidence=0.6, max_motion=25.0, min_points=4):
+        """
+        Run the detector only on keyframes and propagate boxes in between:
+        1. Full detection every `interval` frames
+        2. Early keyframe when a box moves more than `max_motion` pixels
+        3. Early keyframe when a tracked box has confidence below `min_confidence`
+        4. Early keyframe when optical flow loses a box
+        """
+        self.interval = max(1, int(interval))
+        self.min_confidence = min_confidence
+        self.max_motion = max_motion
+        self.min_points = min_points
+
+        # Lucas-Kanade optical flow parameters
+        self.lk_params = dict(
+            winSize=(21, 21), maxLevel=3,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03)
+        )
+
+        self.prev_gray = None
+        self.boxes = []
+        self.frames_since_keyframe = 0
+
+        # Statistics for the end-of-run report
+        self.frame_count = 0
+        self.model_calls = 0
+        self.triggers = {'interval': 0, 'motion': 0, 'confidence': 0, 'lost': 0}
+        self.iou_sum = 0.0
+        self.iou_count = 0
+
+    def reset(self):
+        """Forget tracked boxes so the next frame is a keyframe"""
+        self.prev_gray = None
+        self.boxes = []
+        self.frames_since_keyframe = 0
+
+    def sample_points(self, gray, box):
+        """Pick trackable points inside a box (corners, falling back to a grid)"""
+        h, w = gray.shape[:2]
+        x1, y1 = max(0, int(box[0])), max(0, int(box[1]))
+        x2, y2 = min(w, int(box[2])), min(h, int(box[3]))
+        if x2 - x1 < 2 or y2 - y1 < 2:
+            return None
+
+        corners = cv2.goodFeaturesToTrack(
+            gray[y1:y2, x1:x2], maxCorners=30, qualityLevel=0.01, minDistance=3
+        )
+        if corners is not None and len(corners) >= self.min_points:
+            return corners.reshape(-1, 2) + np.array([x1, y1], np.float32)
+
+        xs = np.linspace(x1, x2 - 1, 5, dtype=np.float32)
+        ys = np.linspace(y1, y2 - 1, 5, dtype=np.float32)
+        return np.stack(np.meshgrid(xs, ys), axis=-1).reshape(-1, 2)
+
+    def propagate(self, gray):
+        """
+        Move the previous boxes onto the current frame with sparse optical flow.
+        Returns (boxes, trigger) where boxes is None if a keyframe is needed.
+        """
+        if not self.boxes:
+            return [], None
+
+        point_sets = [self.sample_points(self.prev_gray, box) for box in self.boxes]
+        if any(points is None for points in point_sets):
+            return None, 'lost'
+
+        p0 = np.concatenate(point_sets).reshape(-1, 1, 2)
+        p1, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, p0, None, **self.lk_params)
+        p0, p1, status = p0.reshape(-1, 2), p1.reshape(-1, 2), status.ravel().astype(bool)
+
+        h, w = gray.shape[:2]
+        propagated = []
+        start = 0
+        for box, points in zip(self.boxes, point_sets):
+            end = start + len(points)
+            ok = status[start:end]
+            old, new = p0[start:end][ok], p1[start:end][ok]
+            start = end
+
+            if len(old) < self.min_points:
+                return None, 'lost'
+
+            shift = np.median(new - old, axis=0)
+            if np.hypot(shift[0], shift[1]) > self.max_motion:
+                return None, 'motion'
+
+            # Scale change from the spread of points around their centroid
+            old_spread = np.linalg.norm(old - old.mean(axis=0), axis=1)
+            new_spread = np.linalg.norm(new - new.mean(axis=0), axis=1)
+            valid = old_spread > 1e-3
+            scale = float(np.median(new_spread[valid] / old_spread[valid])) if valid.any() else 1.0
+
+            x1, y1, x2, y2, conf, cls = box
+            cx = (x1 + x2) / 2 + float(shift[0])
+            cy = (y1 + y2) / 2 + float(shift[1])
+            half_w = (x2 - x1) * scale / 2
+            half_h = (y2 - y1) * scale / 2
+
+            # Keep boxes inside the frame; one that has left it needs a fresh detection
+            nx1, ny1 = max(0.0, cx - half_w), max(0.0, cy - half_h)
+            nx2, ny2 = min(float(w), cx + half_w), min(float(h), cy + half_h)
+            if nx2 - nx1 < 2 or ny2 - ny1 < 2:
+                return None, 'lost'
+            propagated.append((nx1, ny1, nx2, ny2, conf, cls))
+
+        return propagated, None
+
+    def record_drift(self, propagated, detected):
+        """Track how far propagated boxes drifted from a fresh detection"""
+        for det in detected:
+            same_class = [box for box in propagated if box[5] == det[5]]
+            if same_class:
+                self.iou_sum += max(box_iou(det, box) for box in same_class)
+                self.iou_count += 1
+
+    def update(self, frame, detect_fn):
+        """Return boxes for this frame, calling detect_fn(frame) only on keyframes"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        self.frame_count += 1
+
+        boxes, trigger = None, 'interval'
+        if self.prev_gray is not None:
+            boxes, trigger = self.propagate(gray)
+            if boxes is not None:
+                if self.frames_since_keyframe + 1 >= self.interval:
+                    trigger = 'interval'
+                elif any(box[4] < self.min_confidence for box in boxes):
+                    trigger = 'confidence'
+
+        if trigger is not None:
+            detected = detect_fn(frame)
+            self.model_calls += 1
+            self.triggers[trigger] += 1
+            if boxes:
+                self.record_drift(boxes, detected)
+            boxes = detected
+            self.frames_since_keyframe = 0
+        else:
+            self.frames_since_keyframe += 1
+
+        self.prev_gray = gray
+        self.boxes = boxes
+        return boxes
+
+    def report(self):
+        """Summary of model-call savings and propagation accuracy"""
+        return {
+            'frames': self.frame_count,
+            'model_calls': self.model_calls,
+            'reduction': self.frame_count / self.model_calls if self.model_calls else 0.0,
+            'mean_keyframe_iou': self.iou_sum / self.iou_count if self.iou_count else None,
+            'triggers': dict(self.triggers),
+        }
+
+    def print_report(self):
+        """Print the keyframe report"""
+        stats = self.report()
+        print("\n" + "=" * 60)
+        print("📊 Keyframe Detection Report")
+        print("=" * 60)
+        print(f"Frames processed : {stats['frames']}")
+        print(f"Model calls      : {stats['model_calls']} ({stats['reduction']:.1f}x fewer)")
+        if stats['mean_keyframe_iou'] is not None:
+            print(f"Propagated IoU   : {stats['mean_keyframe_iou']:.3f} (vs fresh detection at keyframes)")
+        print("Keyframe triggers: " + ", ".join(f"{k}={v}" for k, v in stats['triggers'].items()))
+        print("=" * 60)
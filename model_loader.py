@@ -0,0 +1,89 @@
+import threading
+import time
+
+import numpy as np
+
+# --------------------------------
+# BACKGROUND MODEL LOADING
+# --------------------------------
+
+class ModelLoader:
+    def __init__(self, model_path, warmup_runs=3, warmup_shape=(480, 640, 3), conf=0.25):
+        """
+        Load YOLO off the startup path so the server can listen immediately:
+        1. ultralytics is imported and the weights loaded in a background thread
+        2. Warm-up inferences on a blank frame pay the lazy first-call setup
+        3. `ready` is set only after warm-up; every phase is timed
+        """
+        self.model_path = model_path
+        self.warmup_runs = warmup_runs
+        self.warmup_shape = warmup_shape
+        self.conf = conf
+
+        self.model = None
+        self.state = 'pending'
+        self.error = None
+        self.ready = threading.Event()
+        self.created = time.perf_counter()
+        self.phases = {}
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._load, name="model-loader", daemon=True)
+        self.thread.start()
+        return self
+
+    def _phase(self, name, start):
+        now = time.perf_counter()
+        self.phases[name] = round(now - start, 3)
+        return now
+
+    def _load(self):
+        try:
+            start = time.perf_counter()
+            self.state = 'loading'
+            from ultralytics import YOLO
+            start = self._phase('import', start)
+
+            model = YOLO(self.model_path)
+            start = self._phase('load', start)
+
+            self.state = 'warming'
+            frame = np.zeros(self.warmup_shape, np.uint8)
+            if self.warmup_runs:
+                # The first call builds the predictor and moves weights to the device
+                model(frame, conf=self.conf, verbose=False)
+                start = self._phase('first_inference', start)
+                for _ in range(self.warmup_runs - 1):
+                    model(frame, conf=self.conf, verbose=False)
+                if self.warmup_runs > 1:
+                    self._phase('warmup', start)
+
+            self.model = model
+            self.state = 'ready'
+            self.phases['total'] = round(time.perf_counter() - self.created, 3)
+            print(f"✓ Model ready in {self.phases['total']:.2f}s | " +
+                  " | ".join(f"{name} {t:.2f}s" for name, t in self.phases.items() if name != 'total'))
+        except Exception as e:
+            self.state = 'failed'
+            self.error = str(e)
+            print(f"✗ Model failed to load: {e}")
+        finally:
+            self.ready.set()
+
+    def is_ready(self):
+        return self.state == 'ready'
+
+    def wait(self, timeout=None):
+        """Block until loading finished (successfully or not)"""
+        self.ready.wait(timeout)
+        return self.is_ready()
+
+    def snapshot(self):
+        """Startup state and per-phase timings (seconds) for the health endpoint"""
+        snapshot = {'state': self.state, 'phases': dict(self.phases)}
+        if not self.ready.is_set():
+            snapshot['elapsed'] = round(time.perf_counter() - self.created, 3)
+        if self.error:
+            snapshot['error'] = self.error
+        return snapshot
@@ -0,0 +1,311 @@
+import argparse
+import math
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from advanced_distance_detection import AdvancedDistanceDetector
+from keyframe_tracker import boxes_from_results
+
+# --------------------------------
+# MULTI-CAMERA RUNNER
+# --------------------------------
+
+class StreamSource:
+    def __init__(self, source, new_frame, loop=False):
+        """
+        Capture thread for one camera or video file. Cameras keep only the
+        newest frame (older ones are dropped and counted); video files are read
+        one frame per take() so none are skipped, and rewound if `loop` is set.
+        `new_frame` is a Condition shared by all streams of a runner.
+        """
+        self.source = source
+        self.is_file = isinstance(source, str)
+        self.loop = loop
+        self.new_frame = new_frame
+
+        self.cap = cv2.VideoCapture(source)
+        if not self.is_file:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+            self.cap.set(cv2.CAP_PROP_FPS, 30)
+
+        self.frame = None
+        self.seq = 0
+        self.taken_seq = 0
+        self.dropped = 0
+        self.finished = False
+        self.running = True
+        self.thread = threading.Thread(target=self._capture_loop, name=f"capture-{source}", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _capture_loop(self):
+        while self.running:
+            if self.is_file:
+                # Wait until the runner took the previous frame
+                with self.new_frame:
+                    while self.running and self.seq > self.taken_seq:
+                        self.new_frame.wait(0.1)
+
+            ret, frame = self.cap.read()
+            if not ret:
+                if self.is_file and self.loop and self.seq > 0:
+                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                break
+
+            with self.new_frame:
+                self.frame = frame
+                self.seq += 1
+                self.new_frame.notify_all()
+
+        with self.new_frame:
+            self.finished = True
+            self.new_frame.notify_all()
+        self.cap.release()
+
+    def has_new(self):
+        return self.seq > self.taken_seq
+
+    def take(self):
+        """Newest frame not taken yet, or None (call with `new_frame` held)"""
+        if not self.has_new():
+            return None
+        self.dropped += self.seq - self.taken_seq - 1
+        self.taken_seq = self.seq
+        return self.frame
+
+    def stop(self):
+        self.running = False
+        with self.new_frame:
+            self.new_frame.notify_all()
+        self.thread.join(timeout=2.0)
+
+
+class CameraStream:
+    def __init__(self, index, source, new_frame, calibration_file="camera_calibration.json", loop=False):
+        """One stream: its own capture thread plus its own calibration, Kalman and history state"""
+        self.index = index
+        self.name = f"cam{index}"
+        self.capture = StreamSource(source, new_frame, loop)
+        self.detector = AdvancedDistanceDetector(model_path=None, calibration_file=calibration_file)
+        self.frames = 0
+        self.frame_times = deque(maxlen=60)
+        self.last_frame = None
+        self.last_distance = None
+
+    def rolling_fps(self):
+        if len(self.frame_times) < 2:
+            return 0.0
+        return (len(self.frame_times) - 1) / max(self.frame_times[-1] - self.frame_times[0], 1e-9)
+
+
+class MultiCameraRunner:
+    def __init__(self, model, sources, calibration_files=None, conf=0.5, imgsz=640, loop=False):
+        """
+        Run N sources through one shared model:
+        1. Each capture thread holds its stream's newest frame
+        2. Every tick, all streams with a new frame are batched into one predict() call
+        3. Results go back to each stream's own distance pipeline
+        """
+        self.model = model
+        self.conf = conf
+        self.imgsz = imgsz
+        self.new_frame = threading.Condition()
+        calibration_files = calibration_files or []
+
+        self.streams = []
+        for i, source in enumerate(sources):
+            calibration = calibration_files[i] if i < len(calibration_files) else "camera_calibration.json"
+            self.streams.append(CameraStream(i, source, self.new_frame, calibration, loop))
+
+        self.batches = 0
+        self.batch_frames = 0
+        self.inference_time = 0.0
+        self.start_time = None
+
+    def gather(self, timeout=0.5):
+        """Wait for at least one new frame, then take every stream's newest frame"""
+        with self.new_frame:
+            self.new_frame.wait_for(
+                lambda: any(s.capture.has_new() for s in self.streams)
+                or all(s.capture.finished for s in self.streams),
+                timeout
+            )
+            batch = []
+            for stream in self.streams:
+                frame = stream.capture.take()
+                if frame is not None:
+                    batch.append((stream, frame))
+            # File sources wait for their frame to be taken
+            self.new_frame.notify_all()
+        return batch
+
+    def tick(self, draw=True):
+        """Process one batch; returns False once every source has ended"""
+        batch = self.gather()
+        if not batch:
+            return not all(s.capture.finished for s in self.streams)
+
+        frames = [stream.detector.undistort_frame(frame) for stream, frame in batch]
+
+        start = time.perf_counter()
+        results = self.model.predict(frames, conf=self.conf, imgsz=self.imgsz, verbose=False)
+        self.inference_time += time.perf_counter() - start
+        self.batches += 1
+        self.batch_frames += len(frames)
+
+        now = time.perf_counter()
+        for (stream, _), frame, result in zip(batch, frames, results):
+            boxes = boxes_from_results([result])
+            measurements, overall_avg = stream.detector.process_detections(boxes)
+            stream.frames += 1
+            stream.frame_times.append(now)
+            stream.last_distance = overall_avg
+
+            if draw:
+                stream.detector.draw_measurements(frame, measurements, overall_avg)
+                cv2.putText(frame, f"{stream.name} | {stream.rolling_fps():.1f} FPS", (10, 60),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+                stream.last_frame = frame
+        return True
+
+    def mosaic(self, tile_size=(640, 360)):
+        """Grid of the latest annotated frame of every stream"""
+        tile_w, tile_h = tile_size
+        cols = math.ceil(math.sqrt(len(self.streams)))
+        rows = math.ceil(len(self.streams) / cols)
+        grid = np.zeros((rows * tile_h, cols * tile_w, 3), np.uint8)
+        for i, stream in enumerate(self.streams):
+            if stream.last_frame is not None:
+                r, c = divmod(i, cols)
+                grid[r * tile_h:(r + 1) * tile_h, c * tile_w:(c + 1) * tile_w] = \
+                    cv2.resize(stream.last_frame, tile_size, interpolation=cv2.INTER_AREA)
+        return grid
+
+    def report(self):
+        """Aggregate and per-stream throughput since start"""
+        elapsed = max(time.perf_counter() - self.start_time, 1e-9)
+        total = sum(s.frames for s in self.streams)
+        return {
+            'streams': len(self.streams),
+            'elapsed': elapsed,
+            'aggregate_fps': total / elapsed,
+            'avg_batch': self.batch_frames / max(self.batches, 1),
+            'inference_ms_per_frame': self.inference_time / max(self.batch_frames, 1) * 1000,
+            'per_stream': [{
+                'name': s.name,
+                'fps': s.frames / elapsed,
+                'frames': s.frames,
+                'dropped': s.capture.dropped,
+                'distance': s.last_distance,
+            } for s in self.streams],
+        }
+
+    def print_report(self):
+        report = self.report()
+        print("=" * 60)
+        print(f"📹 {report['streams']} streams | aggregate {report['aggregate_fps']:.1f} FPS | "
+              f"avg batch {report['avg_batch']:.2f} | inference {report['inference_ms_per_frame']:.1f} ms/frame")
+        for s in report['per_stream']:
+            distance = f"{s['distance']:.1f}cm" if s['distance'] is not None else "-"
+            print(f"   {s['name']:6} | {s['fps']:6.1f} FPS | {s['frames']:6d} frames | "
+                  f"{s['dropped']:5d} dropped | avg distance {distance}")
+        print("=" * 60)
+
+    def run(self, headless=False, duration=None, max_frames=None, report_every=5.0):
+        """Main loop; stops on ESC, when all sources end, after `duration` s or `max_frames` per stream"""
+        for stream in self.streams:
+            stream.capture.start()
+        self.start_time = last_report = time.perf_counter()
+        print(f"🚀 Multi-camera detection started with {len(self.streams)} streams")
+
+        try:
+            while self.tick(draw=not headless):
+                now = time.perf_counter()
+                if duration is not None and now - self.start_time >= duration:
+                    break
+                if max_frames is not None and min(s.frames for s in self.streams) >= max_frames:
+                    break
+                if report_every and now - last_report >= report_every:
+                    last_report = now
+                    report = self.report()
+                    per_stream = " | ".join(f"{s['name']} {s['fps']:.1f}" for s in report['per_stream'])
+                    print(f"⚡ {report['aggregate_fps']:.1f} FPS total | {per_stream}")
+
+                if not headless:
+                    cv2.imshow("Multi-Camera Distance Detection", self.mosaic())
+                    if cv2.waitKey(1) & 0xFF == 27:  # ESC
+                        break
+        finally:
+            for stream in self.streams:
+                stream.capture.stop()
+            if not headless:
+                cv2.destroyAllWindows()
+
+        self.print_report()
+        return self.report()
+
+
+def parse_source(source):
+    return int(source) if source.isdigit() else source
+
+
+def sweep(model, sources, args):
+    """Run with 1, 2, 4, ... streams and report how throughput scales"""
+    counts = sorted({min(2 ** k, len(sources)) for k in range(int(math.log2(len(sources))) + 2)})
+    rows = []
+    for count in counts:
+        runner = MultiCameraRunner(model, sources[:count], args.calibration, args.conf, args.imgsz, loop=True)
+        report = runner.run(headless=True, duration=args.duration, report_every=0)
+        per_stream = [s['fps'] for s in report['per_stream']]
+        rows.append((count, report['aggregate_fps'], min(per_stream), max(per_stream), report['avg_batch']))
+
+    print("\n📈 Scaling")
+    print(f"{'streams':>8} | {'total FPS':>9} | {'min/stream':>10} | {'max/stream':>10} | {'avg batch':>9}")
+    for count, total, lo, hi, avg_batch in rows:
+        print(f"{count:8d} | {total:9.1f} | {lo:10.1f} | {hi:10.1f} | {avg_batch:9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distance detection on several cameras with one shared model")
+    parser.add_argument("sources", nargs="+", help="Camera indexes or video files")
+    parser.add_argument("--model", default="best.pt", help="YOLO weights (loaded once)")
+    parser.add_argument("--calibration", action="append",
+                        help="Calibration file per stream, in source order (repeatable)")
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--streams", type=int,
+                        help="Reuse the sources round-robin to get this many streams (video files only)")
+    parser.add_argument("--loop", action="store_true", help="Rewind video files at the end")
+    parser.add_argument("--headless", action="store_true", help="No window, only print FPS")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds (per run with --sweep)")
+    parser.add_argument("--max-frames", type=int, help="Stop after this many frames per stream")
+    parser.add_argument("--sweep", action="store_true",
+                        help="Benchmark 1, 2, 4, ... of the given sources (video files loop)")
+    args = parser.parse_args()
+
+    sources = [parse_source(s) for s in args.sources]
+    if args.streams:
+        sources = [sources[i % len(sources)] for i in range(args.streams)]
+    # Most capture backends can't open one camera in two VideoCaptures
+    cameras = [s for s in sources if isinstance(s, int)]
+    if len(cameras) != len(set(cameras)):
+        parser.error("a camera index can only be used by one stream "
+                     "(--streams reuses sources round-robin; use video files for it)")
+
+    from ultralytics import YOLO
+    model = YOLO(args.model)
+
+    if args.sweep:
+        args.duration = args.duration or 10.0
+        sweep(model, sources, args)
+    else:
+        runner = MultiCameraRunner(model, sources, args.calibration, args.conf, args.imgsz, args.loop)
+        runner.run(args.headless, args.duration, args.max_frames)
@@ -1,6 +1,8 @@
 import cv2
 import math
 from ultralytics import YOLO
+from keyframe_tracker import KeyframeTracker, boxes_from_results
+from roi_zoom import RoiZoomDetector
 
 # ================== CONFIG ==================
 MODEL_PATH = "best.pt"
@@ -9,6 +11,13 @@ CONF_THRESHOLD = 0.5
 
 REAL_OBJECT_HEIGHT_CM = 12.0
 FOCAL_LENGTH_PIXELS = 1400.0
+
+KEYFRAME_INTERVAL = 1   # >1: run YOLO every N frames, propagate boxes in between
+
+# Crop-and-zoom: low-res pass for candidates, high-res pass on padded crops only
+ROI_ZOOM = False
+LOW_RES_IMGSZ = 320
+HIGH_RES_IMGSZ = 640
 # ============================================
 
 model = YOLO(MODEL_PATH)
@@ -20,56 +29,66 @@ cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
 if not cap.isOpened():
     raise RuntimeError("❌ Could not open webcam")
 
-print("✅ Press 'q' to quit")
+keyframe_tracker = KeyframeTracker(KEYFRAME_INTERVAL) if KEYFRAME_INTERVAL > 1 else None
+roi_detector = RoiZoomDetector(
+    model, low_imgsz=LOW_RES_IMGSZ, high_imgsz=HIGH_RES_IMGSZ, conf=CONF_THRESHOLD
+) if ROI_ZOOM else None
 
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
+
+def detect_boxes(frame):
+    if roi_detector:
+        return roi_detector.detect(frame)
 
     results = model.predict(
         source=frame,
         conf=CONF_THRESHOLD,
         verbose=False
     )
+    return boxes_from_results(results)
 
-    for r in results:
-        if r.boxes is None:
-            continue
 
-        for box in r.boxes:
-            x1, y1, x2, y2 = box.xyxy[0].tolist()
-            conf = float(box.conf[0])
+print("✅ Press 'q' to quit")
 
-            bbox_height_px = y2 - y1
-            if bbox_height_px <= 0:
-                continue
+while True:
+    ret, frame = cap.read()
+    if not ret:
+        break
 
-            # 🔹 ADD THIS PRINT HERE 🔹
-            print(f"Bounding box height: {bbox_height_px:.1f} pixels")
+    if keyframe_tracker:
+        boxes = keyframe_tracker.update(frame, detect_boxes)
+    else:
+        boxes = detect_boxes(frame)
 
-            # Distance calculation
-            distance_cm = (REAL_OBJECT_HEIGHT_CM * FOCAL_LENGTH_PIXELS) / bbox_height_px
+    for x1, y1, x2, y2, conf, cls in boxes:
+        bbox_height_px = y2 - y1
+        if bbox_height_px <= 0:
+            continue
+
+        # 🔹 ADD THIS PRINT HERE 🔹
+        print(f"Bounding box height: {bbox_height_px:.1f} pixels")
 
-            cv2.rectangle(
-                frame,
-                (int(x1), int(y1)),
-                (int(x2), int(y2)),
-                (0, 255, 0),
-                2
-            )
+        # Distance calculation
+        distance_cm = (REAL_OBJECT_HEIGHT_CM * FOCAL_LENGTH_PIXELS) / bbox_height_px
 
-            label = f"zlij {conf:.2f} | {distance_cm:.1f} cm"
+        cv2.rectangle(
+            frame,
+            (int(x1), int(y1)),
+            (int(x2), int(y2)),
+            (0, 255, 0),
+            2
+        )
 
-            cv2.putText(
-                frame,
-                label,
-                (int(x1), int(y1) - 10),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.7,
-                (0, 255, 0),
-                2
-            )
+        label = f"zlij {conf:.2f} | {distance_cm:.1f} cm"
+
+        cv2.putText(
+            frame,
+            label,
+            (int(x1), int(y1) - 10),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.7,
+            (0, 255, 0),
+            2
+        )
 
     cv2.imshow("zlij Detection + Distance (C920)", frame)
 
@@ -77,4 +96,7 @@ while True:
         break
 
 cap.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+cv2.destroyAllWindows()
+
+if keyframe_tracker:
+    keyframe_tracker.print_report()
\ No newline at end of file
@@ -1,16 +1,246 @@
-from inference_sdk import InferenceHTTPClient
-
-client = InferenceHTTPClient(
-    api_url="https://serverless.roboflow.com",
-    api_key="BbNlVkaSYTUeNTmL11Su"
-)
-
-result = client.run_workflow(
-    workspace_name="firsttest-s0stw",
-    workflow_id="find-zlijs",
-    images={
-        "image": "z.png"
-    },
-    use_cache=True # cache workflow definition for 15 minutes
-)
-print(result)
\ No newline at end of file
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# --------------------------------
+# ROBOFLOW WORKFLOW CLIENT
+# --------------------------------
+
+API_URL = "https://serverless.roboflow.com"
+WORKSPACE_NAME = "firsttest-s0stw"
+WORKFLOW_ID = "find-zlijs"
+
+
+class WorkflowClient:
+    def __init__(self, api_url=API_URL, api_key=None, workspace_name=WORKSPACE_NAME,
+                 workflow_id=WORKFLOW_ID, max_workers=8, timeout=10.0, retries=3, backoff=0.5,
+                 cache_dir=".roboflow_cache", fallback_model="best.pt",
+                 failure_threshold=5, cooldown=30.0):
+        """
+        Client for the hosted workflow, built for thousands of images:
+        1. Concurrent requests over one pooled HTTP session (bounded parallelism)
+        2. Retries with exponential backoff on connection errors, 429 and 5xx
+        3. On-disk response cache keyed by endpoint and image hash
+        4. Local YOLO fallback when the endpoint is slow or unavailable
+        5. Circuit breaker that skips the endpoint for `cooldown` seconds
+           after `failure_threshold` consecutive failures
+
+        api_key defaults to the ROBOFLOW_API_KEY environment variable.
+        """
+        api_key = api_key or os.environ.get("ROBOFLOW_API_KEY")
+        if not api_key:
+            raise ValueError("No Roboflow API key: set ROBOFLOW_API_KEY or pass api_key")
+        self.url = f"{api_url.rstrip('/')}/{workspace_name}/workflows/{workflow_id}"
+        self.api_key = api_key
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # One cache per endpoint/workflow, so a stand-in server's responses never
+        # answer for the real workflow (or the other way round)
+        endpoint_key = hashlib.sha256(self.url.encode()).hexdigest()[:16]
+        self.cache_dir = Path(cache_dir) / endpoint_key if cache_dir else None
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        # Local model is only loaded if a fallback is actually needed
+        self.fallback_model = fallback_model
+        self.local_model = None
+        self.local_lock = threading.Lock()
+
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.circuit_open_until = 0.0
+
+        self.lock = threading.Lock()
+        self.stats = {'remote': 0, 'cache': 0, 'local': 0, 'retries': 0, 'failures': 0, 'errors': 0}
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def cache_path(self, digest):
+        return self.cache_dir / digest[:2] / f"{digest}.json"
+
+    def load_cached(self, digest):
+        """Return a cached workflow response, if any"""
+        if not self.cache_dir:
+            return None
+        path = self.cache_path(digest)
+        if path.exists():
+            with open(path, 'r') as f:
+                return json.load(f)
+        return None
+
+    def save_cached(self, digest, outputs):
+        """Write a workflow response to the cache atomically"""
+        if not self.cache_dir:
+            return
+        path = self.cache_path(digest)
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp, 'w') as f:
+            json.dump(outputs, f)
+        os.replace(tmp, path)
+
+    def circuit_open(self):
+        return time.monotonic() < self.circuit_open_until
+
+    def record_result(self, ok):
+        """Update the circuit breaker after a remote call"""
+        with self.lock:
+            if ok:
+                self.consecutive_failures = 0
+                return
+            self.stats['failures'] += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.failure_threshold:
+                self.circuit_open_until = time.monotonic() + self.cooldown
+
+    def run_remote(self, image_bytes):
+        """Call the hosted workflow, retrying transient errors with backoff"""
+        payload = {
+            "api_key": self.api_key,
+            "use_cache": True,
+            "inputs": {"image": {"type": "base64", "value": base64.b64encode(image_bytes).decode('ascii')}},
+        }
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            except requests.Timeout:
+                # A slow endpoint won't get faster by asking again; fall back
+                raise
+            except requests.ConnectionError:
+                if attempt == self.retries:
+                    raise
+            else:
+                if response.status_code != 429 and response.status_code < 500:
+                    response.raise_for_status()
+                    return response.json()["outputs"]
+                if attempt == self.retries:
+                    response.raise_for_status()
+
+            self.count('retries')
+            time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+
+    def run_local(self, image_path):
+        """Run the local YOLO model (serialized; the model isn't thread-safe)"""
+        with self.local_lock:
+            if self.local_model is None:
+                from ultralytics import YOLO
+                self.local_model = YOLO(self.fallback_model)
+            results = self.local_model(str(image_path), conf=0.25, verbose=False)
+
+        return [{
+            'class': results[0].names[int(box.cls[0])],
+            'confidence': float(box.conf[0]),
+            'bbox': box.xyxy[0].tolist()
+        } for box in results[0].boxes]
+
+    def run(self, image_path):
+        """Result for one image: cache, then remote, then local fallback"""
+        with open(image_path, 'rb') as f:
+            image_bytes = f.read()
+        digest = hashlib.sha256(image_bytes).hexdigest()
+
+        cached = self.load_cached(digest)
+        if cached is not None:
+            self.count('cache')
+            return {'image': str(image_path), 'source': 'cache', 'result': cached}
+
+        if not self.circuit_open():
+            try:
+                outputs = self.run_remote(image_bytes)
+                self.record_result(True)
+                self.save_cached(digest, outputs)
+                self.count('remote')
+                return {'image': str(image_path), 'source': 'remote', 'result': outputs}
+            except (requests.RequestException, KeyError, ValueError):
+                self.record_result(False)
+
+        result = self.run_local(image_path)
+        self.count('local')
+        return {'image': str(image_path), 'source': 'local', 'result': result}
+
+    def run_safe(self, image_path):
+        """run(), but a failing image becomes an error record instead of raising"""
+        try:
+            return self.run(image_path)
+        except Exception as e:
+            self.count('errors')
+            return {'image': str(image_path), 'source': 'error', 'error': str(e)}
+
+    def run_many(self, image_paths):
+        """
+        Yield results in input order, keeping at most 2x max_workers
+        requests in flight so memory stays flat for large inputs. Images that
+        fail (unreadable file, failed fallback) yield an error record.
+        """
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            pending = []
+            for path in image_paths:
+                pending.append(executor.submit(self.run_safe, path))
+                if len(pending) >= self.max_workers * 2:
+                    yield pending.pop(0).result()
+            for future in pending:
+                yield future.result()
+
+    def close(self):
+        self.session.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Roboflow workflow over many images")
+    parser.add_argument("images", nargs="*", default=["z.png"], help="Image files or directories")
+    parser.add_argument("--api-url", default=API_URL, help="Workflow API URL (e.g. a local stand-in server)")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent requests")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Per-request timeout in seconds")
+    parser.add_argument("--cache-dir", default=".roboflow_cache", help="Response cache directory")
+    parser.add_argument("--output", help="Write results as JSON lines to this file")
+    args = parser.parse_args()
+
+    paths = []
+    for item in args.images:
+        p = Path(item)
+        if p.is_dir():
+            paths.extend(sorted(x for x in p.iterdir() if x.suffix.lower() in ('.jpg', '.jpeg', '.png')))
+        else:
+            paths.append(p)
+
+    try:
+        client = WorkflowClient(api_url=args.api_url, max_workers=args.workers,
+                                timeout=args.timeout, cache_dir=args.cache_dir)
+    except ValueError as e:
+        parser.error(str(e))
+    out = open(args.output, 'w') if args.output else None
+    start = time.time()
+
+    for result in client.run_many(paths):
+        if out:
+            out.write(json.dumps(result) + "\n")
+        else:
+            print(result)
+
+    if out:
+        out.close()
+    client.close()
+
+    elapsed = time.time() - start
+    print(f"✓ {len(paths)} images in {elapsed:.1f}s ({len(paths) / max(elapsed, 1e-9):.1f} img/s) | {client.stats}")
@@ -0,0 +1,210 @@
+import argparse
+import base64
+import hashlib
+import json
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from roboflow import WORKFLOW_ID, WORKSPACE_NAME, WorkflowClient
+
+# --------------------------------
+# LOCAL STAND-IN FOR THE WORKFLOW API
+# --------------------------------
+#
+# Serves POST /<workspace>/workflows/<workflow> like the hosted endpoint, with
+# injectable failures, so WorkflowClient can be exercised offline:
+#   python roboflow_standin.py serve --port 9001 --fail-rate 0.2
+#   python roboflow.py images/ --api-url http://127.0.0.1:9001
+#   python roboflow_standin.py check
+# `check` runs the retry, cache, timeout and fallback paths against an
+# in-process server and exits with status 1 if any of them misbehaves.
+
+
+class StandinServer:
+    def __init__(self, host="127.0.0.1", port=0, fail_rate=0.0, delay=0.0,
+                 workspace_name=WORKSPACE_NAME, workflow_id=WORKFLOW_ID):
+        """
+        Threaded HTTP server answering like the hosted workflow:
+        - `fail_next` requests (then `fail_rate` of the rest) get a 503
+        - every response is delayed by `delay` seconds
+        - `requests` counts calls to the workflow path
+        """
+        self.path = f"/{workspace_name}/workflows/{workflow_id}"
+        self.fail_rate = fail_rate
+        self.fail_next = 0
+        self.delay = delay
+        self.requests = 0
+        self.lock = threading.Lock()
+
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                standin.handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def should_fail(self):
+        with self.lock:
+            self.requests += 1
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                return True
+        return random.random() < self.fail_rate
+
+    def handle(self, request):
+        """Reply to one POST with outputs, or with a 4xx/503"""
+        body = request.rfile.read(int(request.headers.get('Content-Length', 0)))
+        if request.path != self.path:
+            return self.reply(request, 404, {'message': f"unknown workflow {request.path}"})
+
+        fail = self.should_fail()
+        if self.delay:
+            time.sleep(self.delay)
+        if fail:
+            return self.reply(request, 503, {'message': "injected failure"})
+
+        try:
+            image = base64.b64decode(json.loads(body)['inputs']['image']['value'])
+        except (ValueError, KeyError, TypeError):
+            return self.reply(request, 400, {'message': "malformed request"})
+        outputs = [{'image_sha256': hashlib.sha256(image).hexdigest(), 'predictions': []}]
+        self.reply(request, 200, {'outputs': outputs})
+
+    def reply(self, request, status, payload):
+        data = json.dumps(payload).encode()
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread:
+            self.thread.join()
+
+
+# --------------------------------
+# CLIENT CHECK
+# --------------------------------
+
+class _StubResult:
+    names = {0: 'zellige'}
+    boxes = []
+
+
+class StubLocalModel:
+    """Stands in for the local YOLO fallback so the check needs no weights"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, source, **kwargs):
+        self.calls += 1
+        return [_StubResult()]
+
+
+def check(workdir):
+    """Run the client's retry, cache, timeout and fallback paths; returns failures"""
+    failures = []
+
+    def expect(name, ok, detail):
+        print(f"{'✓' if ok else '✗'} {name}: {detail}")
+        if not ok:
+            failures.append(name)
+
+    images = []
+    for i in range(3):
+        path = Path(workdir) / f"image_{i}.jpg"
+        path.write_bytes(f"stand-in image {i}".encode())
+        images.append(path)
+
+    server = StandinServer().start()
+    client = WorkflowClient(api_url=server.url, api_key="standin", max_workers=2, timeout=1.0,
+                            retries=3, backoff=0.01, cache_dir=Path(workdir) / "cache",
+                            failure_threshold=100)
+    client.local_model = StubLocalModel()
+    try:
+        # 5xx is retried with backoff, then the response is cached
+        server.fail_next = 2
+        result = client.run(images[0])
+        expect("retry on 5xx", result['source'] == 'remote' and server.requests == 3
+               and client.stats['retries'] == 2,
+               f"source={result['source']}, requests={server.requests}, retries={client.stats['retries']}")
+
+        requests_before = server.requests
+        result = client.run(images[0])
+        expect("cache hit", result['source'] == 'cache' and server.requests == requests_before,
+               f"source={result['source']}, new requests={server.requests - requests_before}")
+
+        # Retries exhausted: local fallback
+        server.fail_next = client.retries + 1
+        result = client.run(images[1])
+        expect("fallback after 5xx", result['source'] == 'local' and client.local_model.calls == 1,
+               f"source={result['source']}, local calls={client.local_model.calls}")
+
+        # A slow endpoint falls back without retrying
+        server.delay = client.timeout * 2
+        requests_before = server.requests
+        result = client.run(images[2])
+        expect("fallback on timeout", result['source'] == 'local' and server.requests == requests_before + 1,
+               f"source={result['source']}, requests={server.requests - requests_before}")
+        server.delay = 0.0
+
+        # A missing file is reported, not raised, and the run continues
+        results = list(client.run_many([images[0], Path(workdir) / "missing.jpg", images[1]]))
+        expect("per-image errors", [r['source'] for r in results] == ['cache', 'error', 'remote'],
+               f"sources={[r['source'] for r in results]}")
+    finally:
+        client.close()
+        server.stop()
+
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Roboflow workflow API")
+    parser.add_argument("command", choices=["serve", "check"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to wait before each response")
+    args = parser.parse_args()
+
+    if args.command == "check":
+        with tempfile.TemporaryDirectory(prefix="roboflow_check_") as workdir:
+            failed = check(workdir)
+        print("=" * 60)
+        print(f"{'FAIL: ' + ', '.join(failed) if failed else 'PASS'}")
+        print("=" * 60)
+        sys.exit(1 if failed else 0)
+
+    server = StandinServer(args.host, args.port, args.fail_rate, args.delay)
+    print(f"🌐 Stand-in workflow API on {server.url}{server.path}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
@@ -0,0 +1,218 @@
+import time
+
+import cv2
+import numpy as np
+
+from keyframe_tracker import box_iou
+
+# --------------------------------
+# CROP-AND-ZOOM ROI INFERENCE
+# --------------------------------
+
+class RoiZoomDetector:
+    def __init__(self, model, low_imgsz=320, high_imgsz=640, conf=0.5, low_conf=0.25,
+                 pad_ratio=0.5, min_crop=96, max_rois=8):
+        """
+        Two-stage detection for small, distant objects:
+        1. Cheap low-resolution pass over the full frame finds candidates
+        2. Padded crops around candidates (and last frame's boxes) are
+           re-inferred at high resolution in one batch
+        3. Crop boxes are mapped back to full-frame coordinates
+        """
+        self.model = model
+        self.low_imgsz = low_imgsz
+        self.high_imgsz = high_imgsz
+        self.conf = conf
+        self.low_conf = low_conf
+        self.pad_ratio = pad_ratio
+        self.min_crop = min_crop
+        self.max_rois = max_rois
+
+        # Refined boxes from the previous frame, used as extra ROIs
+        self.tracked_boxes = []
+
+    def predict_boxes(self, source, imgsz, conf):
+        """Run the model and return per-image lists of (x1, y1, x2, y2, conf, cls)"""
+        results = self.model.predict(source=source, imgsz=imgsz, conf=conf, verbose=False)
+        batch = []
+        for r in results:
+            boxes = []
+            if r.boxes is not None:
+                for box in r.boxes:
+                    x1, y1, x2, y2 = box.xyxy[0].tolist()
+                    boxes.append((x1, y1, x2, y2, float(box.conf[0]), int(box.cls[0])))
+            batch.append(boxes)
+        return batch
+
+    def crop_window(self, box, frame_w, frame_h):
+        """Padded square-ish crop around a box, clamped to the frame"""
+        x1, y1, x2, y2 = box[:4]
+        w, h = x2 - x1, y2 - y1
+        side_w = max(w * (1 + 2 * self.pad_ratio), self.min_crop)
+        side_h = max(h * (1 + 2 * self.pad_ratio), self.min_crop)
+        cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+
+        cx1 = int(max(0, min(cx - side_w / 2, frame_w - side_w)))
+        cy1 = int(max(0, min(cy - side_h / 2, frame_h - side_h)))
+        cx2 = int(min(frame_w, cx1 + side_w))
+        cy2 = int(min(frame_h, cy1 + side_h))
+        return cx1, cy1, cx2, cy2
+
+    def select_rois(self, candidates):
+        """
+        Merge low-res candidates with tracked boxes the low-res pass missed.
+        Returns (rois to refine, the rest), most confident first; at most
+        `max_rois` are refined.
+        """
+        rois = list(candidates)
+        for tracked in self.tracked_boxes:
+            if all(box_iou(tracked, box) < 0.3 for box in rois):
+                rois.append(tracked)
+        rois.sort(key=lambda box: box[4], reverse=True)
+        return rois[:self.max_rois], rois[self.max_rois:]
+
+    def suppress_duplicates(self, boxes, iou_threshold=0.5):
+        """Greedy NMS across crops (overlapping crops can see the same object)"""
+        kept = []
+        for box in sorted(boxes, key=lambda b: b[4], reverse=True):
+            if all(box[5] != k[5] or box_iou(box, k) < iou_threshold for k in kept):
+                kept.append(box)
+        return kept
+
+    def detect(self, frame):
+        """Return refined full-frame boxes for one frame"""
+        frame_h, frame_w = frame.shape[:2]
+
+        candidates = self.predict_boxes(frame, self.low_imgsz, self.low_conf)[0]
+        rois, overflow = self.select_rois(candidates)
+        if not rois:
+            self.tracked_boxes = []
+            return []
+
+        windows = [self.crop_window(box, frame_w, frame_h) for box in rois]
+        crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in windows]
+        crop_results = self.predict_boxes(crops, self.high_imgsz, self.conf)
+
+        # Only this frame's detections may fall back to their low-res box;
+        # a tracked box the crop no longer confirms is dropped, not carried forward
+        fresh = {id(box) for box in candidates}
+        refined = []
+        for roi, (ox, oy, _, _), boxes in zip(rois, windows, crop_results):
+            mapped = [(x1 + ox, y1 + oy, x2 + ox, y2 + oy, conf, cls)
+                      for x1, y1, x2, y2, conf, cls in boxes]
+            if mapped:
+                refined.extend(mapped)
+            elif id(roi) in fresh and roi[4] >= self.conf:
+                # High-res pass found nothing; keep a confident low-res box
+                refined.append(roi)
+
+        # Candidates beyond max_rois aren't refined but still count as detections
+        refined.extend(box for box in overflow if id(box) in fresh and box[4] >= self.conf)
+
+        refined = self.suppress_duplicates(refined)
+        self.tracked_boxes = refined
+        return refined
+
+
+# --------------------------------
+# BENCHMARK
+# --------------------------------
+
+class _Box:
+    def __init__(self, x1, y1, x2, y2, conf):
+        self.xyxy = [np.array([x1, y1, x2, y2])]
+        self.conf = [conf]
+        self.cls = [0]
+
+
+class _Result:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class SyntheticModel:
+    """
+    Stand-in detector for a bright object on a dark frame. Like YOLO, it
+    letterboxes each image to `imgsz`, so its boxes carry the same
+    resolution-dependent quantization. It counts input pixels as a cost proxy.
+    """
+    def __init__(self):
+        self.pixels = 0
+
+    def predict(self, source, imgsz, conf, verbose=False):
+        images = source if isinstance(source, list) else [source]
+        results = []
+        for image in images:
+            h, w = image.shape[:2]
+            scale = imgsz / max(h, w)
+            small = cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))),
+                               interpolation=cv2.INTER_LINEAR)
+            self.pixels += imgsz * imgsz
+            mask = (cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) > 128).astype(np.uint8)
+            boxes = []
+            if mask.any():
+                x, y, bw, bh = cv2.boundingRect(mask)
+                sx, sy = w / small.shape[1], h / small.shape[0]
+                boxes.append(_Box(x * sx, y * sy, (x + bw) * sx, (y + bh) * sy, 0.9))
+            results.append(_Result(boxes))
+        return results
+
+
+def synthetic_frame(rng, width, height, object_width, object_height):
+    """Dark noisy frame with one bright object at a random sub-pixel position"""
+    ss = 8  # Drawn at 8x and area-averaged down, so edges are sub-pixel accurate
+    frame = rng.normal(50, 8, (height, width, 3)).clip(0, 255).astype(np.uint8)
+    x = rng.uniform(100, width - 100 - object_width)
+    y = rng.uniform(100, height - 100 - object_height)
+    x0, y0 = int(x), int(y)
+    pw, ph = int(object_width) + 3, int(object_height) + 3
+    patch = np.zeros((ph * ss, pw * ss), np.uint8)
+    ox, oy = round((x - x0) * ss), round((y - y0) * ss)
+    patch[oy:oy + round(object_height * ss), ox:ox + round(object_width * ss)] = 255
+    alpha = cv2.resize(patch, (pw, ph), interpolation=cv2.INTER_AREA)[..., None] / 255.0
+    region = frame[y0:y0 + ph, x0:x0 + pw]
+    frame[y0:y0 + ph, x0:x0 + pw] = (region * (1 - alpha) + 230 * alpha).astype(np.uint8)
+    return frame
+
+
+def benchmark(width, height, object_widths, trials, low_imgsz=320, high_imgsz=640, full_imgsz=1280, seed=0):
+    """Pixel-width error and cost of low-res, full high-res and crop-and-zoom detection"""
+    rng = np.random.default_rng(seed)
+    modes = {
+        f'low {low_imgsz}': lambda model, frame: RoiZoomDetector(model).predict_boxes(frame, low_imgsz, 0.25)[0],
+        f'full {full_imgsz}': lambda model, frame: RoiZoomDetector(model).predict_boxes(frame, full_imgsz, 0.25)[0],
+        'roi zoom': lambda model, frame: RoiZoomDetector(model, low_imgsz, high_imgsz).detect(frame),
+    }
+    print(f"Crop-and-zoom benchmark: {width}x{height}, {trials} positions per width, synthetic detector")
+    print(f"{'width px':>8} | {'mode':>9} | {'width err px':>12} | {'distance err':>12} | "
+          f"{'missed':>6} | {'Mpx/frame':>9} | {'ms/frame':>8}")
+    for object_width in object_widths:
+        frames = [synthetic_frame(rng, width, height, object_width, object_width * 3) for _ in range(trials)]
+        for name, run in modes.items():
+            model = SyntheticModel()
+            errors, missed = [], 0
+            start = time.perf_counter()
+            for frame in frames:
+                boxes = run(model, frame)
+                if boxes:
+                    errors.append(abs((boxes[0][2] - boxes[0][0]) - object_width))
+                else:
+                    missed += 1
+            elapsed = (time.perf_counter() - start) / trials * 1000
+            err = np.mean(errors) if errors else float('nan')
+            print(f"{object_width:>8.1f} | {name:>9} | {err:>12.2f} | {100 * err / object_width:>11.1f}% | "
+                  f"{missed:>6} | {model.pixels / trials / 1e6:>9.2f} | {elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Width accuracy and cost of crop-and-zoom inference")
+    parser.add_argument("--size", default="1920x1080", help="Frame size WxH")
+    parser.add_argument("--widths", type=float, nargs="+", default=[6.5, 12.5, 25.5, 50.5],
+                        help="Object widths in pixels")
+    parser.add_argument("--trials", type=int, default=50)
+    args = parser.parse_args()
+
+    width, height = map(int, args.size.lower().split("x"))
+    benchmark(width, height, args.widths, args.trials)
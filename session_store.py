@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+
+from session_tracking import SessionTracker
+
+# --------------------------------
+# WEBCAM SESSION STATE
+# --------------------------------
+
+THUMBNAIL_SIZE = (32, 24)
+
+
+def frame_fingerprint(frame):
+    """Downscaled grayscale thumbnail used to detect scene changes"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+
+
+def frame_change(a, b):
+    """Mean absolute thumbnail difference, 0.0 (identical) to 1.0"""
+    return float(cv2.absdiff(a, b).mean()) / 255.0
+
+
+class WebcamSession:
+    """Per-client state, kept small so thousands of sessions fit in memory"""
+    __slots__ = ('fingerprint', 'response', 'processed_at', 'last_seen', 'lock', 'tracker')
+
+    def __init__(self):
+        self.tracker = SessionTracker()
+        self.fingerprint = None
+        self.response = None
+        self.processed_at = 0.0
+        self.last_seen = time.monotonic()
+        self.lock = threading.Lock()
+
+
+class SessionTable:
+    def __init__(self, max_sessions=5000, ttl=300.0):
+        """
+        Bounded session table:
+        1. Least recently used sessions are evicted beyond `max_sessions`
+        2. Sessions idle for more than `ttl` seconds are evicted
+        """
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+        self.evicted = 0
+
+    def get(self, session_id):
+        """Return the session for an id, creating it if needed"""
+        now = time.monotonic()
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                session = self.sessions[session_id] = WebcamSession()
+            else:
+                self.sessions.move_to_end(session_id)
+            session.last_seen = now
+            self._evict(now)
+            return session
+
+    def _evict(self, now):
+        # Oldest entries sit at the front, so stop at the first live one
+        while self.sessions:
+            session_id, session = next(iter(self.sessions.items()))
+            if len(self.sessions) <= self.max_sessions and now - session.last_seen <= self.ttl:
+                break
+            del self.sessions[session_id]
+            self.evicted += 1
+
+    def __len__(self):
+        return len(self.sessions)
+
+
+class FrameSkipper:
+    def __init__(self, sessions, change_threshold=0.02, max_age=2.0):
+        """
+        Server-side frame-difference skipping for webcam sessions:
+        frames that barely differ from the session's last processed frame
+        reuse its cached response instead of running the model.
+        """
+        self.sessions = sessions
+        self.change_threshold = change_threshold
+        self.max_age = max_age
+        self.checked = 0
+        self.skipped = 0
+
+    def cached_response(self, session, fingerprint):
+        """Return the session's cached response if the scene hasn't changed"""
+        self.checked += 1
+        if session.fingerprint is None or session.response is None:
+            return None
+        if time.monotonic() - session.processed_at > self.max_age:
+            return None
+        if frame_change(session.fingerprint, fingerprint) >= self.change_threshold:
+            return None
+        self.skipped += 1
+        return session.response
+
+    def store(self, session, fingerprint, response):
+        """Remember the fingerprint and response of a processed frame"""
+        session.fingerprint = fingerprint
+        session.response = response
+        session.processed_at = time.monotonic()
+
+    def snapshot(self):
+        """Skip statistics for the health endpoint"""
+        return {
+            'sessions': len(self.sessions),
+            'evicted': self.sessions.evicted,
+            'checked': self.checked,
+            'skipped': self.skipped,
+            'skip_rate': round(self.skipped / self.checked, 3) if self.checked else 0.0,
+        }
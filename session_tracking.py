@@ -0,0 +1,139 @@
+import math
+
+from distance_kalman import DistanceKalman
+from keyframe_tracker import box_iou
+
+# --------------------------------
+# PER-SESSION DISTANCE SMOOTHING
+# --------------------------------
+
+class Track:
+    """
+    Compact per-object state: box, distance Kalman filter and the last few
+    box areas for stability scoring.
+    """
+    __slots__ = ('track_id', 'box', 'cls', 'kalman', 'areas', 'misses')
+
+    def __init__(self, track_id, box, cls, kalman):
+        self.track_id = track_id
+        self.box = box
+        self.cls = cls
+        self.kalman = kalman
+        self.areas = []
+        self.misses = 0
+
+
+class SessionTracker:
+    """Tracks and filters for one webcam session"""
+    __slots__ = ('tracks', 'next_id')
+
+    # Same model as AdvancedDistanceDetector
+    KNOWN_WIDTH = 4.0
+    KNOWN_HEIGHT = 12.0
+    FOCAL_LENGTH = 700
+    WIDTH_WEIGHT = 0.6
+    HEIGHT_WEIGHT = 0.4
+    PROCESS_NOISE = 0.03
+    MEASUREMENT_NOISE = 0.1
+
+    MATCH_IOU = 0.3
+    MAX_MISSES = 10
+    MAX_TRACKS = 32
+    HISTORY = 5
+
+    def __init__(self):
+        self.tracks = []
+        self.next_id = 0
+
+    def measure_distance(self, box):
+        """Width/height weighted distance, as in calculate_distance_with_confidence"""
+        pixel_width, pixel_height = box[2] - box[0], box[3] - box[1]
+        if pixel_width <= 0 or pixel_height <= 0:
+            return None
+        distance_width = (self.KNOWN_WIDTH * self.FOCAL_LENGTH) / pixel_width
+        distance_height = (self.KNOWN_HEIGHT * self.FOCAL_LENGTH) / pixel_height
+        return distance_width * self.WIDTH_WEIGHT + distance_height * self.HEIGHT_WEIGHT
+
+    def stability(self, track, box):
+        """Box-size stability over the last few frames, as in calculate_bbox_stability"""
+        track.areas.append((box[2] - box[0]) * (box[3] - box[1]))
+        del track.areas[:-self.HISTORY]
+        if len(track.areas) < 2:
+            return 0.5
+        mean = sum(track.areas) / len(track.areas)
+        std = math.sqrt(sum((a - mean) ** 2 for a in track.areas) / len(track.areas))
+        return 1.0 / (1.0 + std / mean)
+
+    def match(self, boxes):
+        """Greedy IoU association of detections to existing tracks"""
+        pairs = sorted(
+            ((box_iou(box, track.box), i, track)
+             for i, box in enumerate(boxes)
+             for track in self.tracks if track.cls == box[5]),
+            key=lambda pair: pair[0], reverse=True
+        )
+        assigned, used = {}, set()
+        for iou, i, track in pairs:
+            if iou < self.MATCH_IOU:
+                break
+            if i not in assigned and track.track_id not in used:
+                assigned[i] = track
+                used.add(track.track_id)
+        return assigned
+
+    def update(self, boxes):
+        """
+        Update tracks with one frame of (x1, y1, x2, y2, conf, cls) boxes.
+        Returns per-box (track_id, raw_distance, smoothed_distance, quality) or None.
+        """
+        assigned = self.match(boxes)
+        seen = set()
+        outputs = []
+
+        for i, box in enumerate(boxes):
+            raw = self.measure_distance(box)
+            if raw is None:
+                outputs.append(None)
+                continue
+
+            track = assigned.get(i)
+            if track is None:
+                kalman = DistanceKalman(self.PROCESS_NOISE, self.MEASUREMENT_NOISE, raw)
+                track = Track(self.next_id, box, box[5], kalman)
+                self.next_id += 1
+                self.tracks.append(track)
+            smoothed = track.kalman.update(raw)
+            track.box = box
+            track.misses = 0
+            seen.add(track.track_id)
+
+            quality = (box[4] * 0.5 + self.stability(track, box) * 0.5) * 100
+            outputs.append((track.track_id, raw, smoothed, quality))
+
+        # Age out tracks that were not seen, and keep the table bounded
+        for track in self.tracks:
+            if track.track_id not in seen:
+                track.misses += 1
+        self.tracks = [t for t in self.tracks if t.misses <= self.MAX_MISSES][-self.MAX_TRACKS:]
+        return outputs
+
+
+def tracked_detections(boxes, tracked, names):
+    """API detection dicts for boxes and the matching SessionTracker.update() outputs"""
+    detections = []
+    for (x1, y1, x2, y2, conf, cls), track in zip(boxes, tracked):
+        detection = {
+            'class': names[cls],
+            'confidence': conf,
+            'bbox': [x1, y1, x2, y2]
+        }
+        if track:
+            track_id, raw_distance, distance, quality = track
+            detection.update({
+                'track_id': track_id,
+                'raw_distance_cm': round(raw_distance, 1),
+                'distance_cm': round(distance, 1),
+                'quality': round(quality)
+            })
+        detections.append(detection)
+    return detections
@@ -0,0 +1,269 @@
+import argparse
+import base64
+import gc
+import io
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+# --------------------------------
+# MEMORY SOAK TEST
+# --------------------------------
+#
+# Drives the detectors and the Flask app with synthetic frames and detections
+# for a long time, then checks that memory settled after warm-up:
+#   python soak_test.py all
+#   python soak_test.py advanced --iterations 5000000 --budget-mb 8
+# Exits with status 1 if any target grows beyond its budget.
+
+DEFAULT_ITERATIONS = {
+    'advanced': 1000000,
+    'compare': 1000000,
+    'tracker': 1000000,
+    'app': 20000,
+}
+
+SOAK_SESSIONS = 64
+
+
+def rss_mb():
+    """Current resident set size in MB (peak RSS where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+def synthetic_boxes(rng, max_objects=6, num_classes=3):
+    """One frame of (x1, y1, x2, y2, conf, cls) boxes; the object count varies every frame"""
+    boxes = []
+    for _ in range(rng.randint(0, max_objects)):
+        x1, y1 = rng.uniform(0, 1100), rng.uniform(0, 500)
+        w, h = rng.uniform(20, 150), rng.uniform(60, 200)
+        boxes.append((x1, y1, x1 + w, y1 + h, rng.uniform(0.3, 1.0), rng.randrange(num_classes)))
+    return boxes
+
+
+# --------------------------------
+# TARGETS
+# Each target returns step(i), called once per iteration
+# --------------------------------
+
+def advanced_target(rng):
+    from advanced_distance_detection import AdvancedDistanceDetector
+    detector = AdvancedDistanceDetector(model_path=None)
+    return lambda i: detector.process_detections(synthetic_boxes(rng, max_objects=12, num_classes=8))
+
+
+def compare_target(rng):
+    from compare_methods import DistanceComparison
+    comparator = DistanceComparison(model_path=None)
+
+    def step(i):
+        comparator.process_detections(synthetic_boxes(rng))
+        if i % 30 == 0:
+            comparator.calculate_statistics()
+    return step
+
+
+def tracker_target(rng):
+    from session_tracking import SessionTracker
+    tracker = SessionTracker()
+    return lambda i: tracker.update(synthetic_boxes(rng, max_objects=10))
+
+
+class _SyntheticBox:
+    def __init__(self, box):
+        self.xyxy = [np.array(box[:4], np.float32)]
+        self.conf = [np.float32(box[4])]
+        self.cls = [np.float32(box[5])]
+
+
+class _SyntheticResult:
+    names = {0: 'zlij', 1: 'head', 2: 'helmet'}
+
+    def __init__(self, image, boxes):
+        self.orig_img = image
+        self.boxes = [_SyntheticBox(box) for box in boxes]
+
+    def plot(self):
+        return self.orig_img
+
+
+class SyntheticModel:
+    """Stands in for YOLO so the soak measures the app, not the model"""
+
+    def __init__(self, rng):
+        self.rng = rng
+
+    def __call__(self, source, **kwargs):
+        image = cv2.imread(source) if isinstance(source, str) else source
+        return [_SyntheticResult(image, synthetic_boxes(self.rng))]
+
+
+def app_target(rng, workdir):
+    import app as app_module
+    from history_store import DetectionHistory
+
+    # Keep uploads and history out of the working tree
+    app_module.model_loader.wait()
+    app_module.model_loader.model = SyntheticModel(rng)
+    app_module.model_loader.state = 'ready'
+    app_module.UPLOAD_FOLDER = os.path.join(workdir, 'uploads')
+    os.makedirs(app_module.UPLOAD_FOLDER)
+    app_module.history.close()
+    app_module.history = DetectionHistory(os.path.join(workdir, 'detections.db'))
+    # A small session table reaches its eviction steady state during warm-up;
+    # with the full MAX_SESSIONS the table would still be filling up
+    app_module.webcam_sessions.max_sessions = SOAK_SESSIONS
+    client = app_module.app.test_client()
+
+    # A handful of pre-encoded frames, so the soak doesn't measure JPEG encoding
+    frames = []
+    for k in range(8):
+        img = np.full((240, 320, 3), k * 30, np.uint8)
+        cv2.rectangle(img, (20 + k * 20, 40), (80 + k * 20, 200), (0, 255, 255), -1)
+        frames.append(cv2.imencode('.jpg', img)[1].tobytes())
+    data_urls = ['data:image/jpeg;base64,' + base64.b64encode(f).decode('ascii') for f in frames]
+
+    def step(i):
+        if i % 10 == 0:
+            # Unique file names exercise upload pruning
+            data = {'image': (io.BytesIO(frames[i % len(frames)]), f"soak_{i}.jpg")}
+            client.post('/api/detect', data=data, content_type='multipart/form-data')
+        elif i % 100 == 1:
+            client.get('/api/results?limit=50')
+            client.get('/api/health')
+        else:
+            # Many short-lived sessions exercise session eviction
+            session_id = f"soak-{rng.randrange(SOAK_SESSIONS * 4)}"
+            client.post('/api/detect-webcam',
+                        json={'image': data_urls[rng.randrange(len(data_urls))], 'session_id': session_id})
+
+    def finish():
+        uploads = len(os.listdir(app_module.UPLOAD_FOLDER))
+        print(f"   uploads on disk: {uploads} (limit {app_module.MAX_UPLOADS}) | "
+              f"sessions: {len(app_module.webcam_sessions)}, {app_module.webcam_sessions.evicted} evicted")
+        app_module.history.close()
+        return uploads <= app_module.MAX_UPLOADS
+
+    step.finish = finish
+    return step
+
+
+TARGETS = {
+    'advanced': advanced_target,
+    'compare': compare_target,
+    'tracker': tracker_target,
+    'app': app_target,
+}
+
+
+# --------------------------------
+# SOAK RUNNER
+# --------------------------------
+
+def top_growth(before, after, limit):
+    """Allocation sites that grew the most between two tracemalloc snapshots"""
+    filters = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ]
+    stats = after.filter_traces(filters).compare_to(before.filter_traces(filters), 'lineno')
+    return [stat for stat in stats if stat.size_diff > 0][:limit]
+
+
+def soak(name, args, workdir):
+    rng = random.Random(args.seed)
+    step = TARGETS[name](rng, workdir) if name == 'app' else TARGETS[name](rng)
+    iterations = args.iterations or DEFAULT_ITERATIONS[name]
+    warmup = max(1, int(iterations * args.warmup))
+    sample_every = max(1, iterations // 20)
+
+    print(f"🔥 {name}: {iterations} iterations ({warmup} warm-up)")
+    if args.tracemalloc:
+        tracemalloc.start(args.frames)
+
+    start = time.time()
+    for i in range(warmup):
+        step(i)
+
+    gc.collect()
+    baseline_rss = peak_rss = rss_mb()
+    baseline_snapshot = tracemalloc.take_snapshot() if args.tracemalloc else None
+
+    for i in range(warmup, iterations):
+        step(i)
+        if (i + 1) % sample_every == 0:
+            current = rss_mb()
+            peak_rss = max(peak_rss, current)
+            rate = (i + 1) / (time.time() - start)
+            print(f"   {i + 1:>9} | RSS {current:8.1f} MB ({current - baseline_rss:+.1f}) | {rate:.0f} it/s")
+
+    gc.collect()
+    final_rss = rss_mb()
+    rss_growth = final_rss - baseline_rss
+    ok = rss_growth <= args.budget_mb
+
+    print(f"   RSS {baseline_rss:.1f} → {final_rss:.1f} MB ({rss_growth:+.2f} MB, peak {peak_rss:.1f}, "
+          f"budget {args.budget_mb} MB)")
+
+    if args.tracemalloc:
+        final_snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        growth = top_growth(baseline_snapshot, final_snapshot, args.top)
+        traced_growth = sum(stat.size_diff for stat in final_snapshot.compare_to(baseline_snapshot, 'filename'))
+        per_iteration = traced_growth / max(1, iterations - warmup)
+        ok = ok and traced_growth / 2 ** 20 <= args.budget_mb
+        print(f"   traced heap {traced_growth / 2 ** 20:+.2f} MB ({per_iteration:+.2f} B/iteration)")
+        if growth:
+            print("   top growing allocation sites:")
+            for stat in growth:
+                frame = stat.traceback[0]
+                print(f"     {stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d} blocks  "
+                      f"{frame.filename}:{frame.lineno}")
+
+    if hasattr(step, 'finish'):
+        ok = step.finish() and ok
+
+    print(f"{'✓' if ok else '✗'} {name} {'passed' if ok else 'FAILED'} in {time.time() - start:.1f}s")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Long-running memory soak test")
+    parser.add_argument("targets", nargs="+", choices=list(TARGETS) + ["all"])
+    parser.add_argument("--iterations", type=int, help="Iterations per target (default depends on target)")
+    parser.add_argument("--warmup", type=float, default=0.05, help="Share of iterations run before the baseline")
+    parser.add_argument("--budget-mb", type=float, default=16.0, help="Allowed growth after warm-up")
+    parser.add_argument("--no-tracemalloc", dest="tracemalloc", action="store_false",
+                        help="Only sample RSS (tracemalloc slows the loop down 2-4x)")
+    parser.add_argument("--frames", type=int, default=1, help="Traceback depth of tracemalloc")
+    parser.add_argument("--top", type=int, default=10, help="Allocation sites to report")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    names = list(TARGETS) if "all" in args.targets else args.targets
+    workdir = tempfile.mkdtemp(prefix="soak_")
+    try:
+        results = {name: soak(name, args, workdir) for name in names}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print("=" * 60)
+    for name, ok in results.items():
+        print(f"{name:10} | {'PASS' if ok else 'FAIL'}")
+    print("=" * 60)
+    sys.exit(0 if all(results.values()) else 1)
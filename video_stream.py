@@ -0,0 +1,209 @@
+import json
+import queue
+import threading
+import time
+
+import cv2
+
+from keyframe_tracker import boxes_from_results
+from session_tracking import SessionTracker, tracked_detections
+
+# --------------------------------
+# STREAMED VIDEO DETECTION
+# --------------------------------
+
+_DONE = object()
+
+
+class JobCancelled(Exception):
+    """Raised inside job threads once the client has gone away"""
+
+
+class VideoJob:
+    def __init__(self, path, infer_fn, stride=1, batch_size=8, prefetch=16,
+                 max_events=64, progress_interval=0.5, on_detections=None):
+        """
+        Detect objects in a video file in the background and produce events:
+        1. A decode thread reads every `stride`-th frame (others are grabbed, not decoded)
+        2. An inference thread sends batches of up to `batch_size` frames to
+           infer_fn(frames) -> per-frame results, and tracks objects across frames
+        3. events() yields start / frame / progress / done (or error) events
+        Both hand-offs are bounded queues, so a slow client pauses decoding and
+        memory stays flat whatever the video length.
+        """
+        self.path = path
+        self.infer_fn = infer_fn
+        self.stride = max(1, stride)
+        self.batch_size = max(1, batch_size)
+        self.progress_interval = progress_interval
+        self.on_detections = on_detections
+
+        self.frames = queue.Queue(maxsize=prefetch)
+        self.event_queue = queue.Queue(maxsize=max_events)
+        self.cancelled = threading.Event()
+        self.threads = [
+            threading.Thread(target=self._decode, name="video-decode", daemon=True),
+            threading.Thread(target=self._infer, name="video-infer", daemon=True),
+        ]
+
+        self.total_frames = 0
+        self.fps = 0.0
+        self.processed = 0
+        self.detections = 0
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def join(self, timeout=None):
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def _put(self, q, item):
+        """Blocking put that gives up once the job is cancelled"""
+        while True:
+            if self.cancelled.is_set():
+                raise JobCancelled()
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _emit(self, event, data):
+        self._put(self.event_queue, (event, data))
+
+    def _decode(self):
+        cap = cv2.VideoCapture(self.path)
+        try:
+            if not cap.isOpened():
+                raise ValueError("Could not open video")
+            self.total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            self.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+            self._emit('start', {
+                'frames': self.total_frames,
+                'fps': round(self.fps, 2),
+                'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                'stride': self.stride,
+            })
+
+            index = 0
+            while True:
+                if index % self.stride:
+                    if not cap.grab():
+                        break
+                else:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    self._put(self.frames, (index, frame))
+                index += 1
+            self._put(self.frames, _DONE)
+        except JobCancelled:
+            pass
+        except Exception as e:
+            self._fail(e)
+        finally:
+            cap.release()
+
+    def _next_batch(self):
+        """Block for one frame, then take whatever else is ready up to batch_size"""
+        batch = []
+        while not batch:
+            if self.cancelled.is_set():
+                raise JobCancelled()
+            try:
+                batch.append(self.frames.get(timeout=0.1))
+            except queue.Empty:
+                pass
+        while len(batch) < self.batch_size and batch[-1] is not _DONE:
+            try:
+                batch.append(self.frames.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _infer(self):
+        tracker = SessionTracker()
+        start = last_progress = time.time()
+        try:
+            finished = False
+            while not finished:
+                batch = self._next_batch()
+                if batch[-1] is _DONE:
+                    batch.pop()
+                    finished = True
+                if not batch:
+                    continue
+
+                results = self.infer_fn([frame for _, frame in batch])
+                for (index, _), result in zip(batch, results):
+                    boxes = boxes_from_results([result])
+                    detections = tracked_detections(boxes, tracker.update(boxes), result.names)
+                    self.processed += 1
+                    self.detections += len(detections)
+                    if self.on_detections and detections:
+                        self.on_detections(detections)
+                    self._emit('frame', {
+                        'frame': index,
+                        'time': round(index / self.fps, 3),
+                        'detections': detections,
+                        'count': len(detections),
+                    })
+
+                now = time.time()
+                if now - last_progress >= self.progress_interval:
+                    last_progress = now
+                    self._emit('progress', self.progress(now - start))
+
+            self._emit('done', dict(self.progress(time.time() - start), detections=self.detections))
+            self._put(self.event_queue, _DONE)
+        except JobCancelled:
+            pass
+        except Exception as e:
+            self._fail(e)
+
+    def progress(self, elapsed):
+        expected = -(-self.total_frames // self.stride) if self.total_frames else None
+        return {
+            'processed': self.processed,
+            'expected': expected,
+            'percent': round(100 * self.processed / expected, 1) if expected else None,
+            'elapsed': round(elapsed, 2),
+            'fps': round(self.processed / max(elapsed, 1e-9), 1),
+        }
+
+    def _fail(self, error):
+        """Report an error to the client and stop both threads"""
+        try:
+            self._emit('error', {'error': str(error)})
+            self._put(self.event_queue, _DONE)
+        except JobCancelled:
+            pass
+        self.cancel()
+
+    def events(self):
+        """Yield (event, data) until the job finishes; closing the generator cancels the job"""
+        try:
+            while True:
+                item = self.event_queue.get()
+                if item is _DONE:
+                    return
+                yield item
+        finally:
+            self.cancel()
+
+
+def format_sse(event, data):
+    """Server-Sent Events framing"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def format_ndjson(event, data):
+    """One JSON object per line, with the event name under 'event'"""
+    return json.dumps(dict(data, event=event)) + "\n"